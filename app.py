@@ -5,9 +5,15 @@ Scanner de convergências multi-timeframe para B3
 
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
 import sys
 from pathlib import Path
 import warnings
+import gc
+import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import namedtuple
 
 warnings.filterwarnings('ignore')
 
@@ -15,11 +21,10 @@ warnings.filterwarnings('ignore')
 sys.path.append(str(Path(__file__).parent / 'src'))
 
 from data.asset_loader import AssetLoader
-from data.market_data import MarketDataLoader
+from data.market_data import MarketDataLoader, fetch_ticker_history
 from indicators.cacas_channel import CacasChannel
 from signals.convergence import ConvergenceDetector
 from signals.risk_manager import RiskManager
-from ui.charts import CacasChannelChart
 from backtest.strategy_backtester import CacasBacktester, run_batch_backtest
 
 # Configuração da página
@@ -55,6 +60,659 @@ def init_loaders():
 
 asset_loader, market_loader = init_loaders()
 
+
+# Cache de OHLCV por (ticker, período) - ajustes de parâmetros não baixam de novo.
+# cache_resource: os dados brutos só são lidos (calculate/resample copiam antes de
+# escrever), então cada chamada devolve o mesmo DataFrame sem unpickle - não alterar
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_daily_data(ticker, period):
+    return market_loader.get_daily_data(ticker, period)
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_daily_batch(tickers, period):
+    """Baixa todos os tickers em uma única chamada ao Yahoo: {ticker: DataFrame}"""
+    return market_loader.get_daily_batch(list(tickers), period)
+
+
+# Semanal por (ticker, período): trocar os parâmetros do indicador não reagrega
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_weekly_data(ticker, period):
+    return market_loader.resample_to_weekly(load_daily_data(ticker, period))
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_weekly_batch(tickers, period):
+    """Semanais dos tickers de load_daily_batch: {ticker: DataFrame ou None}"""
+    return {
+        ticker: market_loader.resample_to_weekly(daily)
+        for ticker, daily in load_daily_batch(tickers, period).items()
+    }
+
+
+# Cache do indicador por (ticker, período, parâmetros) - separado dos dados brutos:
+# mudar só o risco não recalcula nada; mudar o indicador não baixa de novo
+@st.cache_data(ttl=3600, show_spinner=False)
+def compute_indicators(ticker, period, upper, under, ema, prescreen=False):
+    """
+    Baixa (individualmente) e calcula o Cacas Channel diário + semanal de um ticker
+    
+    Args:
+        prescreen (bool): Pula o semanal se o preço estiver longe das bandas
+    
+    Returns:
+        dict: {'daily': DataFrame, 'weekly': DataFrame} ou None se sem dados válidos
+    """
+    daily = load_daily_data(ticker, period)
+    weekly = load_weekly_data(ticker, period)
+    
+    if not (market_loader.validate_dataframe(daily) and
+            market_loader.validate_dataframe(weekly)):
+        return None
+    
+    indicator = CacasChannel(upper=upper, under=under, ema=ema)
+    
+    if prescreen and not indicator.is_near_band(daily):
+        return {
+            'daily': indicator.calculate_full(daily, include_crossover=True),
+            'weekly': None,
+            'skip_reason': 'no_signal'
+        }
+    
+    return {
+        'daily': indicator.calculate_full(daily, include_crossover=True),
+        'weekly': indicator.calculate_full(weekly, include_crossover=True)
+    }
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def compute_indicators_batch(tickers, period, upper, under, ema, prescreen=False):
+    """
+    Calcula o Cacas Channel de todos os tickers baixados em lote
+    
+    Os indicadores são vetorizados entre ativos (CacasChannel.calculate_batch).
+    
+    Args:
+        prescreen (bool): Pula o semanal dos ativos com preço longe das bandas
+    
+    Returns:
+        dict: {ticker: {'daily': DataFrame, 'weekly': DataFrame}} só com os válidos
+    """
+    daily_batch = load_daily_batch(tickers, period)
+    weekly_batch = load_weekly_batch(tickers, period)
+    
+    daily_frames = {}
+    weekly_frames = {}
+    
+    for ticker, daily in daily_batch.items():
+        weekly = weekly_batch.get(ticker)
+        
+        if (market_loader.validate_dataframe(daily) and
+                market_loader.validate_dataframe(weekly)):
+            daily_frames[ticker] = daily
+            weekly_frames[ticker] = weekly
+    
+    indicator = CacasChannel(upper=upper, under=under, ema=ema)
+    
+    # Pré-filtro: sem preço perto de uma banda não há convergência a confirmar
+    if prescreen:
+        weekly_frames = {
+            ticker: weekly for ticker, weekly in weekly_frames.items()
+            if indicator.is_near_band(daily_frames[ticker])
+        }
+    
+    # Linhas, sinal e cruzamentos saem juntos do kernel (sem detect_crossover depois)
+    daily_ind = indicator.calculate_batch(daily_frames, include_crossover=True)
+    weekly_ind = indicator.calculate_batch(weekly_frames, include_crossover=True)
+    
+    results = {}
+    
+    for ticker in daily_frames:
+        daily = daily_ind[ticker]
+        
+        if ticker in weekly_ind:
+            results[ticker] = {
+                'daily': daily,
+                'weekly': weekly_ind[ticker]
+            }
+        else:
+            results[ticker] = {'daily': daily, 'weekly': None, 'skip_reason': 'no_signal'}
+    
+    return results
+
+
+# Colunas que a tela de detalhes usa (gráficos, plano de trade, backtest, tabela recente)
+DETAIL_DTYPES = {
+    'Open': 'float32', 'High': 'float32', 'Low': 'float32', 'Close': 'float32', 'Volume': 'float32',
+    'linha_superior': 'float32', 'linha_inferior': 'float32',
+    'linha_media': 'float32', 'linha_ema': 'float32',
+    'sinal': 'int8', 'crossover': 'int8'
+}
+
+
+def slim_frame(df):
+    """
+    Versão enxuta de um DataFrame de resultado para guardar na sessão
+    
+    Mantém só as colunas de DETAIL_DTYPES, com tipos menores (volatilidade,
+    SMAs e 'tendencia' em texto não são exibidos).
+    
+    Args:
+        df (pd.DataFrame): Dados com indicador calculado
+    
+    Returns:
+        pd.DataFrame: Cópia com menos colunas e tipos menores
+    """
+    dtypes = {col: dtype for col, dtype in DETAIL_DTYPES.items() if col in df.columns}
+    
+    return df[list(dtypes)].astype(dtypes)
+
+
+# Rótulo de cada sinal indexado por sinal + 1 (-1 -> VENDA, 0 -> NEUTRO, 1 -> COMPRA)
+SINAL_LABELS = np.array(['🔴 VENDA', '⚪ NEUTRO', '🟢 COMPRA'], dtype=object)
+
+
+# Resultado completo de uma análise (somente leitura - compartilhado entre reruns)
+AnalysisResult = namedtuple('AnalysisResult', ['results', 'failed', 'convergence', 'groups', 'table', 'csv'])
+
+
+# Sem cache próprio: os callbacks escrevem em elementos do Streamlit (status, tabela
+# parcial), o que não pode rodar dentro de uma função cacheada (o replay do cache
+# quebra). O trabalho pesado fica nos helpers cacheados (compute_indicators*), e o
+# resultado fica no session_state para os reruns
+def run_analysis(tickers, period, upper, under, ema, prescreen=False,
+                 max_workers=10, on_progress=None, on_partial=None):
+    """
+    Pipeline completo: download, indicadores e convergências
+    
+    Args:
+        tickers (tuple): Tickers selecionados
+        period (str): Período
+        upper, under, ema (int): Parâmetros do Cacas Channel
+        prescreen (bool): Pré-filtro diário (ver compute_indicators)
+        max_workers (int): Threads do download individual
+        on_progress (callable): on_progress(done, total, texto)
+        on_partial (callable): on_partial(linhas) com as convergências dos ativos
+            recém-calculados, para exibir antes do fim
+    
+    Returns:
+        AnalysisResult: (results, failed, convergence, groups, table, csv) -
+            results só com os ativos de compra (os únicos detalhados na tela),
+            groups = {'buys', 'sells', 'waiting'} já filtrados (mais 'buy_rows':
+            {ticker: linha}), table é a
+            convergência em Arrow (st.dataframe) e csv os bytes da exportação
+    """
+    total = len(tickers)
+    
+    # Agrupa as atualizações de progresso (~20 no total) - cada uma é uma mensagem ao navegador
+    step = max(1, total // 20)
+    
+    def report(done, text):
+        if on_progress is not None and (done % step == 0 or done == total):
+            on_progress(done, total, text)
+    
+    detector = ConvergenceDetector()
+    
+    def publish(fresh):
+        # Só as linhas novas - quem exibe vai acumulando (sem reescanear tudo)
+        if on_partial is not None and fresh:
+            on_partial(detector.scan_multiple_assets(fresh))
+    
+    failed = []
+    
+    # Download em lote (uma requisição) + indicadores vetorizados entre ativos
+    report(0, f"📥 Baixando {total} ativos em lote...")
+    results = dict(compute_indicators_batch(tickers, period, upper, under, ema, prescreen))
+    publish(results)
+    
+    # Ativos fora do lote: download individual em paralelo
+    pending = [t for t in tickers if t not in results]
+    done = len(results)
+    report(done, f"📊 {done}/{total}")
+    
+    fresh = {}
+    
+    # Não abre mais threads do que ativos pendentes (threads são criadas sob demanda)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+        futures = {
+            executor.submit(compute_indicators, ticker, period, upper, under, ema, prescreen): ticker
+            for ticker in pending
+        }
+        
+        for future in as_completed(futures):
+            ticker = futures[future]
+            done += 1
+            report(done, f"📊 {ticker} ({done}/{total})")
+            
+            try:
+                data = future.result()
+                
+                if data is not None:
+                    results[ticker] = data
+                    fresh[ticker] = data
+                else:
+                    failed.append(ticker)
+            except Exception:
+                # Erro inesperado num ativo não derruba a análise (Ctrl+C continua passando)
+                failed.append(ticker)
+            
+            # Mesmo ritmo do progresso: uma atualização da tabela parcial a cada `step`
+            if done % step == 0 or done == total:
+                publish(fresh)
+                fresh = {}
+    
+    # Mantém a ordem original da seleção
+    results = {t: results[t] for t in tickers if t in results}
+    failed = set(failed)
+    failed = [t for t in tickers if t in failed]
+    
+    # Convergências
+    convergence = None
+    groups = {}
+    
+    if results:
+        # status/tipo já saem categóricos do scan (poucos valores distintos)
+        convergence = detector.sort_by_priority(detector.scan_multiple_assets(results))
+        
+        # Filtros do resumo calculados uma vez (reruns do fragmento só leem)
+        groups = {
+            'buys': detector.get_buy_signals(convergence),
+            'sells': detector.get_sell_signals(convergence),
+            'waiting': detector.get_waiting_signals(convergence)
+        }
+        
+        # Linha de cada ativo de compra por ticker (seletor e cabeçalho sem filtrar o DataFrame)
+        groups['buy_rows'] = groups['buys'].set_index('ticker').to_dict('index')
+        
+        # Só os ativos com sinal de compra são detalhados na tela - libera o resto
+        keep = set(groups['buys']['ticker'])
+        results = {
+            t: {tf: slim_frame(data[tf]) for tf in ('daily', 'weekly') if data.get(tf) is not None}
+            for t, data in results.items() if t in keep
+        }
+        gc.collect()
+    
+    # Formatos de exibição/exportação gerados uma vez por análise, não a cada rerun
+    table = None
+    csv = None
+    
+    if convergence is not None:
+        # Arrow: st.dataframe serializa a Table direto
+        table = pa.Table.from_pandas(convergence, preserve_index=False)
+        
+        # to_csv direto em buffer binário: bytes UTF-8 sem str intermediária, no mesmo
+        # formato de sempre (o write_csv do Arrow mudaria aspas, booleanos e categóricos)
+        buf = io.BytesIO()
+        convergence.to_csv(buf, index=False, encoding='utf-8')
+        csv = buf.getvalue()
+    
+    return AnalysisResult(results, failed, convergence, groups, table, csv)
+
+
+def clear_data_cache():
+    """Invalida os dados baixados (força novo download)"""
+    compute_indicators.clear()
+    compute_indicators_batch.clear()
+    load_daily_batch.clear()
+    load_daily_data.clear()
+    load_weekly_batch.clear()
+    load_weekly_data.clear()
+    fetch_ticker_history.clear()
+    market_loader.disk_cache.clear()
+
+
+# Figura Plotly por (dados, título, stop, alvo): voltar a um ativo já visto no
+# seletor reaproveita a figura pronta. cache_resource não copia - não alterar o retorno
+@st.cache_resource(max_entries=32, show_spinner=False)
+def build_chart(data, title, height=600, stop_price=None, target_price=None):
+    """
+    Cria (ou reaproveita) o gráfico do Cacas Channel de um ativo
+    
+    Args:
+        data (pd.DataFrame): Dados com indicador calculado
+        title (str): Título do gráfico
+        height (int): Altura do gráfico
+        stop_price (float): Linha de stop (None = sem linha)
+        target_price (float): Linha de alvo (None = sem linha)
+    
+    Returns:
+        go.Figure: Figura Plotly
+    """
+    from ui.charts import CacasChannelChart
+    
+    return CacasChannelChart().create_single_chart(
+        data,
+        title=title,
+        show_stop=stop_price is not None,
+        stop_price=stop_price,
+        show_target=target_price is not None,
+        target_price=target_price,
+        height=height
+    )
+
+
+# ========== RESULTADOS ==========
+# Fragmento dentro do fragmento: trocar o ativo no seletor reexecuta só o
+# detalhe do ativo (gráficos, plano, backtest), não a tabela e o resumo
+@st.fragment
+def show_ticker_detail(analysis, plans, atr_mult, target_mult):
+    """
+    Renderiza seletor, plano de trade, gráficos e backtest do ativo escolhido
+    
+    Args:
+        analysis (AnalysisResult): Resultado de run_analysis (somente leitura)
+        plans (dict): {ticker: plano} de RiskManager.generate_trade_plan_batch
+        atr_mult (float): Multiplicador ATR do stop
+        target_mult (float): Multiplicador do alvo (×risco)
+    """
+    results = analysis.results
+    buys = analysis.groups['buys']
+    buy_rows = analysis.groups['buy_rows']
+    
+    # Filtrar apenas ativos com sinal de compra
+    if len(buys) > 0:
+        buy_tickers = buys['ticker'].tolist()
+        
+        st.info(f"💡 **{len(buy_tickers)} ativos com sinal de compra!** Selecione um abaixo para ver os gráficos detalhados.")
+        
+        # SELETOR DE ATIVO (dropdown)
+        selected_ticker_for_chart = st.selectbox(
+            "🎯 Selecione o ativo para visualizar:",
+            options=buy_tickers,
+            format_func=lambda x: f"{x} - {buy_rows[x]['status']}",
+            help="Escolha um ativo para ver os gráficos multi-timeframe",
+            key="ticker_selector"  # Key para manter seleção
+        )
+        
+        if selected_ticker_for_chart:
+            ticker = selected_ticker_for_chart
+            row = buy_rows[ticker]
+            
+            st.markdown("---")
+            st.markdown(f"### 📊 {ticker}")
+            st.write(f"**Status:** {row['status']}")
+            st.write(f"**{row['descricao']}**")
+            
+            daily_df = results[ticker]['daily']
+            weekly_df = results[ticker]['weekly']
+            
+            # Stop e alvo já calculados para todas as compras (show_results)
+            plan = plans.get(ticker)
+            
+            # MÉTRICAS
+            st.markdown("#### 💰 Informações de Trade")
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Preço Atual", f"R$ {daily_df['Close'].iat[-1]:.2f}")
+            
+            with col2:
+                if plan:
+                    st.metric("Stop Loss", f"R$ {plan['stop_loss']:.2f}",
+                            delta=f"-{plan['risk_percent']:.1f}%")
+            
+            with col3:
+                if plan:
+                    st.metric("Alvo", f"R$ {plan['target']:.2f}",
+                            delta=f"+{plan['gain_percent']:.1f}%")
+            
+            with col4:
+                if plan:
+                    st.metric("R/R Ratio", f"{plan['risk_reward']:.2f}x")
+            
+            st.markdown("---")
+            
+            # GRÁFICOS LADO A LADO (DIÁRIO + SEMANAL)
+            st.markdown("#### 📊 Gráficos Multi-Timeframe")
+            
+            col_daily, col_weekly = st.columns(2)
+            
+            with col_daily:
+                st.markdown("**📅 Gráfico Diário**")
+                # Gráfico DIÁRIO com STOP e ALVO
+                fig_daily = build_chart(
+                    daily_df,
+                    title=f"{ticker} - DIÁRIO",
+                    stop_price=plan['stop_loss'] if plan else None,
+                    target_price=plan['target'] if plan else None,
+                    height=600
+                )
+                st.plotly_chart(fig_daily, use_container_width=True)
+            
+            with col_weekly:
+                st.markdown("**📅 Gráfico Semanal**")
+                # Gráfico SEMANAL (sem stop/alvo)
+                fig_weekly = build_chart(
+                    weekly_df,
+                    title=f"{ticker} - SEMANAL",
+                    height=600
+                )
+                st.plotly_chart(fig_weekly, use_container_width=True)
+            
+            # TABELA DE DADOS RECENTES
+            st.markdown("---")
+            st.markdown("#### 📋 Dados Recentes (Diário)")
+            
+            # Últimas 10 barras do diário
+            # Fatia as 10 linhas antes de escolher colunas; assign já devolve um novo frame (sem .copy())
+            recent_data = daily_df.iloc[-10:][[
+                'Close', 'linha_superior', 'linha_inferior', 
+                'linha_media', 'linha_ema', 'sinal'
+            ]]
+            
+            recent_data = recent_data.assign(
+                sinal_texto=SINAL_LABELS[recent_data['sinal'].to_numpy(dtype=np.int8) + 1]
+            )
+            
+            st.dataframe(
+                recent_data.round(2),
+                use_container_width=True,
+                column_config={
+                    "Close": "Preço",
+                    "linha_superior": "L. Superior",
+                    "linha_inferior": "L. Inferior",
+                    "linha_media": "L. Branca",
+                    "linha_ema": "L. Laranja",
+                    "sinal_texto": "Sinal"
+                }
+            )
+            
+            # ========== BACKTESTING ==========
+            st.markdown("---")
+            st.markdown(f"#### 📈 BACKTEST DA ESTRATÉGIA - {ticker}")
+            st.info(f"📊 Testando {ticker} com {len(daily_df)} dias de histórico...")
+            
+            # Executar backtest
+            backtester = CacasBacktester(
+                atr_multiplier=atr_mult,
+                target_multiplier=target_mult
+            )
+            
+            bt_results = backtester.run_backtest(daily_df, weekly_df)
+            
+            if bt_results['total_trades'] > 0:
+                # Métricas principais em colunas
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    st.metric(
+                        "Win Rate",
+                        f"{bt_results['win_rate']:.1f}%",
+                        delta=f"Ajustado: {bt_results['adjusted_win_rate']:.1f}%"
+                    )
+                
+                with col2:
+                    st.metric(
+                        "Retorno Total",
+                        f"{bt_results['total_return']:.2f}%",
+                        delta=f"Médio: {bt_results['avg_return']:.2f}%"
+                    )
+                
+                with col3:
+                    st.metric(
+                        "Profit Factor",
+                        f"{bt_results['profit_factor']:.2f}x",
+                        delta="Maior é melhor"
+                    )
+                
+                with col4:
+                    st.metric(
+                        "Total Trades",
+                        bt_results['total_trades'],
+                        delta=f"Alvos: {bt_results['targets_hit']}"
+                    )
+                
+                # Detalhes expandidos
+                with st.expander("🔍 Ver Detalhes Completos do Backtest"):
+                    col_a, col_b = st.columns(2)
+                    
+                    with col_a:
+                        st.markdown("**📈 Performance**")
+                        st.write(f"Retorno Médio (Wins): **{bt_results['avg_win']:.2f}%**")
+                        st.write(f"Retorno Médio (Losses): **{bt_results['avg_loss']:.2f}%**")
+                        st.write(f"Melhor Trade: **{bt_results['best_trade']:.2f}%**")
+                        st.write(f"Pior Trade: **{bt_results['worst_trade']:.2f}%**")
+                        st.write(f"Expectância: **{bt_results['expectancy']:.2f}%**")
+                    
+                    with col_b:
+                        st.markdown("**🛡️ Risco**")
+                        st.write(f"Max Drawdown: **{bt_results['max_drawdown']:.2f}%**")
+                        st.write(f"Sharpe Ratio: **{bt_results['sharpe_ratio']:.2f}**")
+                        st.write(f"Stops Atingidos: **{bt_results['stops_hit']}** ({bt_results['stops_hit']/bt_results['total_trades']*100:.1f}%)")
+                        st.write(f"Alvos Atingidos: **{bt_results['targets_hit']}** ({bt_results['targets_hit']/bt_results['total_trades']*100:.1f}%)")
+                        st.write(f"Tempo Médio: **{bt_results['avg_bars_in_trade']:.0f} dias**")
+                    
+                    # Tabela de trades
+                    if len(bt_results['trades']) > 0:
+                        st.markdown("---")
+                        st.markdown("**📋 Histórico de Trades**")
+                        
+                        # Datas formatadas só na exibição (a tabela do backtest não é alterada)
+                        trades_df = bt_results['trades'][['entry_date', 'entry_price', 'exit_date', 'exit_price', 'return_pct', 'exit_reason']]
+                        trades_df = trades_df.assign(
+                            entry_date=pd.to_datetime(trades_df['entry_date']).dt.strftime('%d/%m/%Y'),
+                            exit_date=pd.to_datetime(trades_df['exit_date']).dt.strftime('%d/%m/%Y')
+                        )
+                        
+                        st.dataframe(
+                            trades_df.round(2),
+                            use_container_width=True,
+                            column_config={
+                                "entry_date": "Entrada",
+                                "entry_price": "Preço Entrada",
+                                "exit_date": "Saída",
+                                "exit_price": "Preço Saída",
+                                "return_pct": st.column_config.NumberColumn("Retorno %", format="%.2f%%"),
+                                "exit_reason": "Razão"
+                            }
+                        )
+                
+                # Interpretação
+                st.markdown("---")
+                st.markdown("**💡 Interpretação:**")
+                
+                if bt_results['win_rate'] >= 60:
+                    st.success(f"✅ **Estratégia FORTE** - Win rate de {bt_results['win_rate']:.1f}% é excelente!")
+                elif bt_results['win_rate'] >= 50:
+                    st.info(f"ℹ️ **Estratégia BOA** - Win rate de {bt_results['win_rate']:.1f}% é positivo.")
+                else:
+                    st.warning(f"⚠️ **Estratégia FRACA** - Win rate de {bt_results['win_rate']:.1f}% está abaixo de 50%.")
+                
+                if bt_results['profit_factor'] >= 2.0:
+                    st.success(f"✅ **Profit Factor {bt_results['profit_factor']:.2f}** - Ótimo! Cada R$ 1 perdido gera R$ {bt_results['profit_factor']:.2f} de ganho.")
+                elif bt_results['profit_factor'] >= 1.5:
+                    st.info(f"ℹ️ **Profit Factor {bt_results['profit_factor']:.2f}** - Bom! Lucrativo mas pode melhorar.")
+                else:
+                    st.warning(f"⚠️ **Profit Factor {bt_results['profit_factor']:.2f}** - Baixo. Revise parâmetros de stop/alvo.")
+                
+            else:
+                st.warning("⚠️ Nenhum trade identificado no período histórico. A estratégia não gerou sinais suficientes.")
+
+    else:
+        st.info("ℹ️ Nenhum sinal de compra encontrado nos ativos analisados.")
+
+
+# Fragmento: trocar o ativo do gráfico, abrir expanders etc. reexecuta só este
+# bloco, não o script inteiro (sidebar, filtros, pipeline)
+@st.fragment
+def show_results(analysis, atr_mult, target_mult):
+    """
+    Renderiza tabela, resumo, gráficos, backtest e exportação de uma análise
+    
+    Args:
+        analysis (AnalysisResult): Resultado de run_analysis (somente leitura)
+        atr_mult (float): Multiplicador ATR do stop
+        target_mult (float): Multiplicador do alvo (×risco)
+    """
+    # ========== ANÁLISE ==========
+    st.markdown("---")
+    st.subheader("📊 RESULTADOS")
+    
+    conv_results = analysis.convergence
+    
+    # Tabela COMPLETA com TODOS os dados
+    st.dataframe(
+        analysis.table,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "ticker": st.column_config.TextColumn("Ticker", width="small"),
+            "status": st.column_config.TextColumn("Status", width="medium"),
+            "descricao": st.column_config.TextColumn("Descrição", width="large"),
+            "semanal": st.column_config.NumberColumn("Semanal", format="%d"),
+            "diario": st.column_config.NumberColumn("Diário", format="%d"),
+            "convergente": st.column_config.CheckboxColumn("Convergente"),
+            "tipo": st.column_config.TextColumn("Tipo", width="small")
+        }
+    )
+    
+    # Stats
+    st.markdown("---")
+    st.subheader("📈 Resumo")
+    
+    buys = analysis.groups['buys']
+    sells = analysis.groups['sells']
+    waiting = analysis.groups['waiting']
+    
+    cols = st.columns(4)
+    cols[0].metric("🟢 Compra", len(buys))
+    cols[1].metric("🔴 Venda", len(sells))
+    cols[2].metric("🟡 Aguardando", len(waiting))
+    cols[3].metric("📊 Total", len(conv_results))
+    
+    # ========== VISUALIZAÇÃO OTIMIZADA (1 GRÁFICO POR VEZ) ==========
+    st.markdown("---")
+    st.subheader("📈 VISUALIZAÇÃO DE GRÁFICOS")
+    
+    # Plano de trade de todas as compras em uma passada (o seletor só consulta)
+    risk_mgr = RiskManager(atr_multiplier=atr_mult)
+    plans = risk_mgr.generate_trade_plan_batch(
+        {t: analysis.results[t]['daily'] for t in buys['ticker']},
+        entry_type='long',
+        target_multiplier=target_mult
+    ).to_dict('index')
+    
+    show_ticker_detail(analysis, plans, atr_mult, target_mult)
+    
+    # Download
+    st.markdown("---")
+    st.subheader("💾 Exportar")
+    
+    st.download_button(
+        "📥 Baixar CSV",
+        analysis.csv,
+        f"cacas_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        "text/csv",
+        use_container_width=True
+    )
+    
+    # Botão para limpar análise
+    st.markdown("---")
+    if st.button("🔄 Nova Análise", use_container_width=True):
+        st.session_state.clear()
+        st.rerun()
+
+
 # ========== SIDEBAR ==========
 with st.sidebar:
     st.header("⚙️ CONFIGURAÇÕES")
@@ -104,6 +762,9 @@ with st.sidebar:
     if selected_categories:
         assets_df = asset_loader.filter_by_category(selected_categories)
         
+        # Lista de tickers montada uma vez por rerun (opções, padrão e "Selecionar Todos")
+        all_tickers = assets_df['ticker'].to_numpy().tolist()
+        
         # MOSTRAR QUANTOS ATIVOS ESTÃO DISPONÍVEIS NA CATEGORIA
         st.success(f"✅ **{len(assets_df)} ativos disponíveis nas categorias selecionadas**")
         
@@ -117,7 +778,7 @@ with st.sidebar:
         
         if selection_mode == "Selecionar Todos":
             # TODOS OS ATIVOS DA CATEGORIA
-            selected_tickers = assets_df['ticker'].tolist()
+            selected_tickers = all_tickers
             st.success(f"✅ **{len(selected_tickers)} ativos selecionados**")
             
             # Mostra amostra
@@ -129,21 +790,21 @@ with st.sidebar:
             with st.expander("🔍 Buscar e selecionar"):
                 search = st.text_input("Buscar:", placeholder="Ex: PETR, Vale")
                 
+                # Padrão: os 10 primeiros da busca (ou da categoria)
+                default_tickers = all_tickers[:10]
+                
                 if search:
                     filtered = asset_loader.search_assets(search, selected_categories)
                     if not filtered.empty:
                         st.success(f"✅ {len(filtered)} encontrados")
-                        display_df = filtered
+                        default_tickers = filtered['ticker'].iloc[:10].tolist()
                     else:
                         st.warning("Nada encontrado")
-                        display_df = assets_df.head(20)
-                else:
-                    display_df = assets_df.head(20)
                 
                 selected_tickers = st.multiselect(
                     "Ativos:",
-                    options=assets_df['ticker'].tolist(),
-                    default=display_df['ticker'].tolist()[:10],
+                    options=all_tickers,
+                    default=default_tickers,
                     help="Selecione os ativos desejados"
                 )
     else:
@@ -152,349 +813,83 @@ with st.sidebar:
     
     st.markdown("---")
     
-    # Período
-    st.subheader("📅 PERÍODO")
-    period_options = {
-        '6 meses': '6mo',
-        '1 ano': '1y',
-        '2 anos': '2y',
-        '3 anos': '3y',
-        '5 anos': '5y',
-        '10 anos': '10y'
-    }
-    period_label = st.selectbox(
-        "Período:",
-        options=list(period_options.keys()),
-        index=1
-    )
-    period = period_options[period_label]
-    
-    st.markdown("---")
-    
-    # Indicador
-    st.subheader("⚙️ INDICADOR")
-    with st.expander("Parâmetros", expanded=False):
-        upper = st.number_input("Upper:", 5, 100, 20)
-        under = st.number_input("Under:", 5, 100, 30)
-        ema = st.number_input("EMA:", 3, 50, 9)
-    
-    st.markdown("---")
-    
-    # Risco
-    st.subheader("🎯 RISCO")
-    atr_mult = st.slider("Stop (ATR×):", 1.0, 3.0, 1.5, 0.5)
-    target_mult = st.selectbox("Alvo (×Risco):", [1.5, 2.0, 2.5, 3.0], index=1)
-    
-    st.markdown("---")
-    
-    # Botão
-    analyze_button = st.button("🚀 ANALISAR", type="primary", use_container_width=True)
-
-# ========== MAIN ==========
-
-# Verificar se já existe análise no session state
-if 'analysis_done' in st.session_state and st.session_state['analysis_done'] and not analyze_button:
-    # CARREGAR RESULTADOS DO SESSION STATE
-    results = st.session_state.get('results', {})
-    atr_mult = st.session_state.get('atr_mult', 1.5)
-    target_mult = st.session_state.get('target_mult', 2.0)
-    
-    # Reinicializar objetos necessários
-    detector = ConvergenceDetector()
-    risk_mgr = RiskManager(atr_multiplier=atr_mult)
-    chart_maker = CacasChannelChart()
-    
-    # Pular para a seção de resultados
-    if len(results) > 0:
-        st.success(f"✅ **Análise anterior: {len(results)} ativos processados**")
-        
-        # ========== ANÁLISE ==========
-        st.markdown("---")
-        st.subheader("📊 RESULTADOS")
-        
-        # Convergências
-        conv_results = detector.scan_multiple_assets(results)
-        conv_results = detector.sort_by_priority(conv_results)
-        
-        # Tabela COMPLETA com TODOS os dados
-        st.dataframe(
-            conv_results,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "ticker": st.column_config.TextColumn("Ticker", width="small"),
-                "status": st.column_config.TextColumn("Status", width="medium"),
-                "descricao": st.column_config.TextColumn("Descrição", width="large"),
-                "semanal": st.column_config.NumberColumn("Semanal", format="%d"),
-                "diario": st.column_config.NumberColumn("Diário", format="%d"),
-                "convergente": st.column_config.CheckboxColumn("Convergente"),
-                "tipo": st.column_config.TextColumn("Tipo", width="small")
-            }
+    # Parâmetros da análise em um formulário: mexer neles não reexecuta o script,
+    # só o ANALISAR. A seleção de ativos fica fora (as opções dependem umas das outras)
+    with st.form("config", border=False):
+        # Período
+        st.subheader("📅 PERÍODO")
+        period_options = {
+            '6 meses': '6mo',
+            '1 ano': '1y',
+            '2 anos': '2y',
+            '3 anos': '3y',
+            '5 anos': '5y',
+            '10 anos': '10y'
+        }
+        period_label = st.selectbox(
+            "Período:",
+            options=list(period_options.keys()),
+            index=1
         )
+        period = period_options[period_label]
         
-        # Stats
         st.markdown("---")
-        st.subheader("📈 Resumo")
         
-        buys = detector.get_buy_signals(conv_results)
-        sells = detector.get_sell_signals(conv_results)
-        waiting = detector.get_waiting_signals(conv_results)
+        # Indicador
+        st.subheader("⚙️ INDICADOR")
+        with st.expander("Parâmetros", expanded=False):
+            upper = st.number_input("Upper:", 5, 100, 20)
+            under = st.number_input("Under:", 5, 100, 30)
+            ema = st.number_input("EMA:", 3, 50, 9)
+        
+        st.markdown("---")
         
-        cols = st.columns(4)
-        cols[0].metric("🟢 Compra", len(buys))
-        cols[1].metric("🔴 Venda", len(sells))
-        cols[2].metric("🟡 Aguardando", len(waiting))
-        cols[3].metric("📊 Total", len(conv_results))
+        # Risco
+        st.subheader("🎯 RISCO")
+        atr_mult = st.slider("Stop (ATR×):", 1.0, 3.0, 1.5, 0.5)
+        target_mult = st.selectbox("Alvo (×Risco):", [1.5, 2.0, 2.5, 3.0], index=1)
         
-        # ========== VISUALIZAÇÃO OTIMIZADA (1 GRÁFICO POR VEZ) ==========
         st.markdown("---")
-        st.subheader("📈 VISUALIZAÇÃO DE GRÁFICOS")
         
-        # Filtrar apenas ativos com sinal de compra
-        if len(buys) > 0:
-            buy_tickers = buys['ticker'].tolist()
-            
-            st.info(f"💡 **{len(buy_tickers)} ativos com sinal de compra!** Selecione um abaixo para ver os gráficos detalhados.")
-            
-            # SELETOR DE ATIVO (dropdown)
-            selected_ticker_for_chart = st.selectbox(
-                "🎯 Selecione o ativo para visualizar:",
-                options=buy_tickers,
-                format_func=lambda x: f"{x} - {buys[buys['ticker']==x]['status'].values[0]}",
-                help="Escolha um ativo para ver os gráficos multi-timeframe",
-                key="ticker_selector"  # Key para manter seleção
+        # Avançado
+        with st.expander("⚡ Avançado", expanded=False):
+            max_workers = st.slider(
+                "Downloads paralelos:", 1, 20, 10,
+                help="Número de ativos baixados simultaneamente"
             )
             
-            if selected_ticker_for_chart:
-                ticker = selected_ticker_for_chart
-                row = buys[buys['ticker'] == ticker].iloc[0]
-                
-                st.markdown("---")
-                st.markdown(f"### 📊 {ticker}")
-                st.write(f"**Status:** {row['status']}")
-                st.write(f"**{row['descricao']}**")
-                
-                daily_df = results[ticker]['daily']
-                weekly_df = results[ticker]['weekly']
-                latest = daily_df.iloc[-1]
-                
-                # CALCULAR STOP E ALVO
-                plan = risk_mgr.generate_trade_plan(
-                    daily_df,
-                    entry_type='long',
-                    target_multiplier=target_mult
-                )
-                
-                # MÉTRICAS
-                st.markdown("#### 💰 Informações de Trade")
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("Preço Atual", f"R$ {latest['Close']:.2f}")
-                
-                with col2:
-                    if plan:
-                        st.metric("Stop Loss", f"R$ {plan['stop_loss']['price']:.2f}",
-                                delta=f"-{plan['stop_loss']['risk_percent']:.1f}%")
-                
-                with col3:
-                    if plan:
-                        st.metric("Alvo", f"R$ {plan['target']['price']:.2f}",
-                                delta=f"+{plan['target']['gain_percent']:.1f}%")
-                
-                with col4:
-                    if plan:
-                        st.metric("R/R Ratio", f"{plan['risk_reward']:.2f}x")
-                
-                st.markdown("---")
-                
-                # GRÁFICOS LADO A LADO (DIÁRIO + SEMANAL)
-                st.markdown("#### 📊 Gráficos Multi-Timeframe")
-                
-                col_daily, col_weekly = st.columns(2)
-                
-                with col_daily:
-                    st.markdown("**📅 Gráfico Diário**")
-                    # Gráfico DIÁRIO com STOP e ALVO
-                    fig_daily = chart_maker.create_single_chart(
-                        daily_df,
-                        title=f"{ticker} - DIÁRIO",
-                        show_stop=True if plan else False,
-                        stop_price=plan['stop_loss']['price'] if plan else None,
-                        show_target=True if plan else False,
-                        target_price=plan['target']['price'] if plan else None,
-                        height=600
-                    )
-                    st.plotly_chart(fig_daily, use_container_width=True)
-                
-                with col_weekly:
-                    st.markdown("**📅 Gráfico Semanal**")
-                    # Gráfico SEMANAL (sem stop/alvo)
-                    fig_weekly = chart_maker.create_single_chart(
-                        weekly_df,
-                        title=f"{ticker} - SEMANAL",
-                        height=600
-                    )
-                    st.plotly_chart(fig_weekly, use_container_width=True)
-                
-                # TABELA DE DADOS RECENTES
-                st.markdown("---")
-                st.markdown("#### 📋 Dados Recentes (Diário)")
-                
-                # Últimas 10 barras do diário
-                recent_data = daily_df[[
-                    'Close', 'linha_superior', 'linha_inferior', 
-                    'linha_media', 'linha_ema', 'sinal'
-                ]].tail(10).copy()
-                
-                recent_data['sinal_texto'] = recent_data['sinal'].map({
-                    1: '🟢 COMPRA',
-                    -1: '🔴 VENDA',
-                    0: '⚪ NEUTRO'
-                })
-                
-                st.dataframe(
-                    recent_data.round(2),
-                    use_container_width=True,
-                    column_config={
-                        "Close": "Preço",
-                        "linha_superior": "L. Superior",
-                        "linha_inferior": "L. Inferior",
-                        "linha_media": "L. Branca",
-                        "linha_ema": "L. Laranja",
-                        "sinal_texto": "Sinal"
-                    }
-                )
-                
-                # ========== BACKTESTING ==========
-                st.markdown("---")
-                st.markdown(f"#### 📈 BACKTEST DA ESTRATÉGIA - {ticker}")
-                st.info(f"📊 Testando {ticker} com {len(daily_df)} dias de histórico...")
-                
-                # Executar backtest
-                backtester = CacasBacktester(
-                    atr_multiplier=atr_mult,
-                    target_multiplier=target_mult
-                )
-                
-                bt_results = backtester.run_backtest(daily_df, weekly_df)
-                
-                if bt_results['total_trades'] > 0:
-                    # Métricas principais em colunas
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        st.metric(
-                            "Win Rate",
-                            f"{bt_results['win_rate']:.1f}%",
-                            delta=f"Ajustado: {bt_results['adjusted_win_rate']:.1f}%"
-                        )
-                    
-                    with col2:
-                        st.metric(
-                            "Retorno Total",
-                            f"{bt_results['total_return']:.2f}%",
-                            delta=f"Médio: {bt_results['avg_return']:.2f}%"
-                        )
-                    
-                    with col3:
-                        st.metric(
-                            "Profit Factor",
-                            f"{bt_results['profit_factor']:.2f}x",
-                            delta="Maior é melhor"
-                        )
-                    
-                    with col4:
-                        st.metric(
-                            "Total Trades",
-                            bt_results['total_trades'],
-                            delta=f"Alvos: {bt_results['targets_hit']}"
-                        )
-                    
-                    # Detalhes expandidos
-                    with st.expander("🔍 Ver Detalhes Completos do Backtest"):
-                        col_a, col_b = st.columns(2)
-                        
-                        with col_a:
-                            st.markdown("**📈 Performance**")
-                            st.write(f"Retorno Médio (Wins): **{bt_results['avg_win']:.2f}%**")
-                            st.write(f"Retorno Médio (Losses): **{bt_results['avg_loss']:.2f}%**")
-                            st.write(f"Melhor Trade: **{bt_results['best_trade']:.2f}%**")
-                            st.write(f"Pior Trade: **{bt_results['worst_trade']:.2f}%**")
-                            st.write(f"Expectância: **{bt_results['expectancy']:.2f}%**")
-                        
-                        with col_b:
-                            st.markdown("**🛡️ Risco**")
-                            st.write(f"Max Drawdown: **{bt_results['max_drawdown']:.2f}%**")
-                            st.write(f"Sharpe Ratio: **{bt_results['sharpe_ratio']:.2f}**")
-                            st.write(f"Stops Atingidos: **{bt_results['stops_hit']}** ({bt_results['stops_hit']/bt_results['total_trades']*100:.1f}%)")
-                            st.write(f"Alvos Atingidos: **{bt_results['targets_hit']}** ({bt_results['targets_hit']/bt_results['total_trades']*100:.1f}%)")
-                            st.write(f"Tempo Médio: **{bt_results['avg_bars_in_trade']:.0f} dias**")
-                        
-                        # Tabela de trades
-                        if len(bt_results['trades_list']) > 0:
-                            st.markdown("---")
-                            st.markdown("**📋 Histórico de Trades**")
-                            
-                            trades_df = pd.DataFrame(bt_results['trades_list'])
-                            trades_df['entry_date'] = pd.to_datetime(trades_df['entry_date']).dt.strftime('%d/%m/%Y')
-                            trades_df['exit_date'] = pd.to_datetime(trades_df['exit_date']).dt.strftime('%d/%m/%Y')
-                            
-                            st.dataframe(
-                                trades_df[['entry_date', 'entry_price', 'exit_date', 'exit_price', 'return_pct', 'exit_reason']].round(2),
-                                use_container_width=True,
-                                column_config={
-                                    "entry_date": "Entrada",
-                                    "entry_price": "Preço Entrada",
-                                    "exit_date": "Saída",
-                                    "exit_price": "Preço Saída",
-                                    "return_pct": st.column_config.NumberColumn("Retorno %", format="%.2f%%"),
-                                    "exit_reason": "Razão"
-                                }
-                            )
-                    
-                    # Interpretação
-                    st.markdown("---")
-                    st.markdown("**💡 Interpretação:**")
-                    
-                    if bt_results['win_rate'] >= 60:
-                        st.success(f"✅ **Estratégia FORTE** - Win rate de {bt_results['win_rate']:.1f}% é excelente!")
-                    elif bt_results['win_rate'] >= 50:
-                        st.info(f"ℹ️ **Estratégia BOA** - Win rate de {bt_results['win_rate']:.1f}% é positivo.")
-                    else:
-                        st.warning(f"⚠️ **Estratégia FRACA** - Win rate de {bt_results['win_rate']:.1f}% está abaixo de 50%.")
-                    
-                    if bt_results['profit_factor'] >= 2.0:
-                        st.success(f"✅ **Profit Factor {bt_results['profit_factor']:.2f}** - Ótimo! Cada R$ 1 perdido gera R$ {bt_results['profit_factor']:.2f} de ganho.")
-                    elif bt_results['profit_factor'] >= 1.5:
-                        st.info(f"ℹ️ **Profit Factor {bt_results['profit_factor']:.2f}** - Bom! Lucrativo mas pode melhorar.")
-                    else:
-                        st.warning(f"⚠️ **Profit Factor {bt_results['profit_factor']:.2f}** - Baixo. Revise parâmetros de stop/alvo.")
-                    
-                else:
-                    st.warning("⚠️ Nenhum trade identificado no período histórico. A estratégia não gerou sinais suficientes.")
-
-        else:
-            st.info("ℹ️ Nenhum sinal de compra encontrado nos ativos analisados.")
+            prescreen = st.checkbox(
+                "Pré-filtro diário",
+                value=False,
+                help="Só calcula o semanal dos ativos com preço a menos de 5% de uma banda "
+                     "(mais rápido; os demais ficam como aguardando)"
+            )
         
-        # Download
         st.markdown("---")
-        st.subheader("💾 Exportar")
-        
-        csv = conv_results.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            "📅 Baixar CSV",
-            csv,
-            f"cacas_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            "text/csv",
-            use_container_width=True
-        )
         
-        # Botão para limpar análise
-        st.markdown("---")
-        if st.button("🔄 Nova Análise", use_container_width=True):
-            st.session_state.clear()
-            st.rerun()
+        # Botão
+        analyze_button = st.form_submit_button("🚀 ANALISAR", type="primary", use_container_width=True)
+    
+    # Fora do formulário (st.button não é permitido dentro dele)
+    if st.button("🔄 Atualizar dados", use_container_width=True,
+                 help="Descarta os dados em cache e baixa novamente"):
+        clear_data_cache()
+        st.success("✅ Cache limpo")
+
+# ========== MAIN ==========
+
+# Verificar se já existe análise no session state
+if 'analysis_done' in st.session_state and st.session_state['analysis_done'] and not analyze_button:
+    # CARREGAR RESULTADOS DO SESSION STATE
+    analysis = st.session_state.get('analysis')
+    atr_mult = st.session_state.get('atr_mult', 1.5)
+    target_mult = st.session_state.get('target_mult', 2.0)
+    
+    # Pular para a seção de resultados
+    if analysis is not None and analysis.convergence is not None:
+        st.success(f"✅ **Análise anterior: {len(analysis.convergence)} ativos processados**")
+        
+        show_results(analysis, atr_mult, target_mult)
 
 elif not selected_tickers:
     st.info("👈 **Selecione ativos na barra lateral**")
@@ -527,355 +922,51 @@ elif not selected_tickers:
 elif analyze_button:
     # ========== PROCESSAMENTO ==========
     
-    st.subheader(f"🔄 Analisando {len(selected_tickers)} ativos...")
-    
-    # Progress
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    # Inicia
-    indicator = CacasChannel(upper=upper, under=under, ema=ema)
-    detector = ConvergenceDetector()
-    risk_mgr = RiskManager(atr_multiplier=atr_mult)
-    chart_maker = CacasChannelChart()
-    
-    results = {}
-    failed = []
-    
     # SALVAR PARÂMETROS NO SESSION STATE
     st.session_state['atr_mult'] = atr_mult
     st.session_state['target_mult'] = target_mult
     
     total = len(selected_tickers)
     
-    for i, ticker in enumerate(selected_tickers):
-        progress = (i + 1) / total
-        progress_bar.progress(progress)
-        status_text.text(f"📊 {ticker} ({i+1}/{total})")
+    # Progresso em um único st.status (um elemento atualizado, não barra + texto)
+    with st.status(f"🔄 Analisando {total} ativos...") as status:
+        # Convergências parciais aparecem conforme os ativos ficam prontos
+        live_table = st.empty()
+        partial_rows = []
         
-        try:
-            # Download
-            daily = market_loader.get_daily_data(ticker, period)
-            weekly = market_loader.get_weekly_data(ticker, period)
-            
-            # Valida
-            if (market_loader.validate_dataframe(daily) and 
-                market_loader.validate_dataframe(weekly)):
-                
-                # Calcula
-                daily_ind = indicator.calculate_full(daily)
-                weekly_ind = indicator.calculate_full(weekly)
-                
-                # Cruza
-                daily_ind = indicator.detect_crossover(daily_ind)
-                weekly_ind = indicator.detect_crossover(weekly_ind)
-                
-                results[ticker] = {
-                    'daily': daily_ind,
-                    'weekly': weekly_ind
-                }
-            else:
-                failed.append(ticker)
-        except:
-            failed.append(ticker)
-    
-    progress_bar.empty()
-    status_text.empty()
+        def on_progress(done, total, text):
+            status.update(label=f"🔄 {text}")
+        
+        def on_partial(rows):
+            partial_rows.append(rows)
+            live_table.dataframe(pd.concat(partial_rows, ignore_index=True),
+                                 use_container_width=True, hide_index=True)
+        
+        analysis = run_analysis(
+            tuple(selected_tickers), period, upper, under, ema, prescreen,
+            max_workers=max_workers, on_progress=on_progress, on_partial=on_partial
+        )
+        
+        # A tabela final (ordenada) é exibida pelo show_results
+        live_table.empty()
+        status.update(label=f"✅ {total} ativos analisados", state="complete")
     
     # Resultado
-    success = len(results)
-    fail = len(failed)
+    success = len(analysis.convergence) if analysis.convergence is not None else 0
+    fail = len(analysis.failed)
     
     if success > 0:
         # SALVAR RESULTADOS NO SESSION STATE
-        st.session_state['results'] = results
+        st.session_state['analysis'] = analysis
         st.session_state['analysis_done'] = True
         
         st.success(f"✅ **{success}/{total} ativos processados com sucesso!**")
         
         if fail > 0:
             with st.expander(f"⚠️ {fail} ativos sem dados"):
-                st.warning(", ".join(failed))
-        
-        # ========== ANÁLISE ==========
-        st.markdown("---")
-        st.subheader("📊 RESULTADOS")
-        
-        # Convergências
-        conv_results = detector.scan_multiple_assets(results)
-        conv_results = detector.sort_by_priority(conv_results)
-        
-        # Tabela COMPLETA com TODOS os dados
-        st.dataframe(
-            conv_results,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "ticker": st.column_config.TextColumn("Ticker", width="small"),
-                "status": st.column_config.TextColumn("Status", width="medium"),
-                "descricao": st.column_config.TextColumn("Descrição", width="large"),
-                "semanal": st.column_config.NumberColumn("Semanal", format="%d"),
-                "diario": st.column_config.NumberColumn("Diário", format="%d"),
-                "convergente": st.column_config.CheckboxColumn("Convergente"),
-                "tipo": st.column_config.TextColumn("Tipo", width="small")
-            }
-        )
-        
-        # Stats
-        st.markdown("---")
-        st.subheader("📈 Resumo")
-        
-        buys = detector.get_buy_signals(conv_results)
-        sells = detector.get_sell_signals(conv_results)
-        waiting = detector.get_waiting_signals(conv_results)
-        
-        cols = st.columns(4)
-        cols[0].metric("🟢 Compra", len(buys))
-        cols[1].metric("🔴 Venda", len(sells))
-        cols[2].metric("🟡 Aguardando", len(waiting))
-        cols[3].metric("📊 Total", len(conv_results))
-        
-        # ========== VISUALIZAÇÃO OTIMIZADA (1 GRÁFICO POR VEZ) ==========
-        st.markdown("---")
-        st.subheader("📈 VISUALIZAÇÃO DE GRÁFICOS")
-        
-        # Filtrar apenas ativos com sinal de compra
-        if len(buys) > 0:
-            buy_tickers = buys['ticker'].tolist()
-            
-            st.info(f"💡 **{len(buy_tickers)} ativos com sinal de compra!** Selecione um abaixo para ver os gráficos detalhados.")
-            
-            # SELETOR DE ATIVO (dropdown)
-            selected_ticker_for_chart = st.selectbox(
-                "🎯 Selecione o ativo para visualizar:",
-                options=buy_tickers,
-                format_func=lambda x: f"{x} - {buys[buys['ticker']==x]['status'].values[0]}",
-                help="Escolha um ativo para ver os gráficos multi-timeframe"
-            )
-            
-            if selected_ticker_for_chart:
-                ticker = selected_ticker_for_chart
-                row = buys[buys['ticker'] == ticker].iloc[0]
-                
-                st.markdown("---")
-                st.markdown(f"### 📊 {ticker}")
-                st.write(f"**Status:** {row['status']}")
-                st.write(f"**{row['descricao']}**")
-                
-                daily_df = results[ticker]['daily']
-                weekly_df = results[ticker]['weekly']
-                latest = daily_df.iloc[-1]
-                
-                # CALCULAR STOP E ALVO
-                plan = risk_mgr.generate_trade_plan(
-                    daily_df,
-                    entry_type='long',
-                    target_multiplier=target_mult
-                )
-                
-                # MÉTRICAS
-                st.markdown("#### 💰 Informações de Trade")
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("Preço Atual", f"R$ {latest['Close']:.2f}")
-                
-                with col2:
-                    if plan:
-                        st.metric("Stop Loss", f"R$ {plan['stop_loss']['price']:.2f}",
-                                delta=f"-{plan['stop_loss']['risk_percent']:.1f}%")
-                
-                with col3:
-                    if plan:
-                        st.metric("Alvo", f"R$ {plan['target']['price']:.2f}",
-                                delta=f"+{plan['target']['gain_percent']:.1f}%")
-                
-                with col4:
-                    if plan:
-                        st.metric("R/R Ratio", f"{plan['risk_reward']:.2f}x")
-                
-                st.markdown("---")
-                
-                # GRÁFICOS LADO A LADO (DIÁRIO + SEMANAL)
-                st.markdown("#### 📊 Gráficos Multi-Timeframe")
-                
-                col_daily, col_weekly = st.columns(2)
-                
-                with col_daily:
-                    st.markdown("**📅 Gráfico Diário**")
-                    # Gráfico DIÁRIO com STOP e ALVO
-                    fig_daily = chart_maker.create_single_chart(
-                        daily_df,
-                        title=f"{ticker} - DIÁRIO",
-                        show_stop=True if plan else False,
-                        stop_price=plan['stop_loss']['price'] if plan else None,
-                        show_target=True if plan else False,
-                        target_price=plan['target']['price'] if plan else None,
-                        height=600
-                    )
-                    st.plotly_chart(fig_daily, use_container_width=True)
-                
-                with col_weekly:
-                    st.markdown("**📅 Gráfico Semanal**")
-                    # Gráfico SEMANAL (sem stop/alvo)
-                    fig_weekly = chart_maker.create_single_chart(
-                        weekly_df,
-                        title=f"{ticker} - SEMANAL",
-                        height=600
-                    )
-                    st.plotly_chart(fig_weekly, use_container_width=True)
-                
-                # TABELA DE DADOS RECENTES
-                st.markdown("---")
-                st.markdown("#### 📋 Dados Recentes (Diário)")
-                
-                # Últimas 10 barras do diário
-                recent_data = daily_df[[
-                    'Close', 'linha_superior', 'linha_inferior', 
-                    'linha_media', 'linha_ema', 'sinal'
-                ]].tail(10).copy()
-                
-                recent_data['sinal_texto'] = recent_data['sinal'].map({
-                    1: '🟢 COMPRA',
-                    -1: '🔴 VENDA',
-                    0: '⚪ NEUTRO'
-                })
-                
-                st.dataframe(
-                    recent_data.round(2),
-                    use_container_width=True,
-                    column_config={
-                        "Close": "Preço",
-                        "linha_superior": "L. Superior",
-                        "linha_inferior": "L. Inferior",
-                        "linha_media": "L. Branca",
-                        "linha_ema": "L. Laranja",
-                        "sinal_texto": "Sinal"
-                    }
-                )
-                
-                # ========== BACKTESTING ==========
-                st.markdown("---")
-                st.markdown(f"#### 📈 BACKTEST DA ESTRATÉGIA - {ticker}")
-                st.info(f"📊 Testando {ticker} com {len(daily_df)} dias de histórico...")
-                
-                # Executar backtest
-                backtester = CacasBacktester(
-                    atr_multiplier=atr_mult,
-                    target_multiplier=target_mult
-                )
-                
-                bt_results = backtester.run_backtest(daily_df, weekly_df)
-                
-                if bt_results['total_trades'] > 0:
-                    # Métricas principais em colunas
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        st.metric(
-                            "Win Rate",
-                            f"{bt_results['win_rate']:.1f}%",
-                            delta=f"Ajustado: {bt_results['adjusted_win_rate']:.1f}%"
-                        )
-                    
-                    with col2:
-                        st.metric(
-                            "Retorno Total",
-                            f"{bt_results['total_return']:.2f}%",
-                            delta=f"Médio: {bt_results['avg_return']:.2f}%"
-                        )
-                    
-                    with col3:
-                        st.metric(
-                            "Profit Factor",
-                            f"{bt_results['profit_factor']:.2f}x",
-                            delta="Maior é melhor"
-                        )
-                    
-                    with col4:
-                        st.metric(
-                            "Total Trades",
-                            bt_results['total_trades'],
-                            delta=f"Alvos: {bt_results['targets_hit']}"
-                        )
-                    
-                    # Detalhes expandidos
-                    with st.expander("🔍 Ver Detalhes Completos do Backtest"):
-                        col_a, col_b = st.columns(2)
-                        
-                        with col_a:
-                            st.markdown("**📈 Performance**")
-                            st.write(f"Retorno Médio (Wins): **{bt_results['avg_win']:.2f}%**")
-                            st.write(f"Retorno Médio (Losses): **{bt_results['avg_loss']:.2f}%**")
-                            st.write(f"Melhor Trade: **{bt_results['best_trade']:.2f}%**")
-                            st.write(f"Pior Trade: **{bt_results['worst_trade']:.2f}%**")
-                            st.write(f"Expectância: **{bt_results['expectancy']:.2f}%**")
-                        
-                        with col_b:
-                            st.markdown("**🛡️ Risco**")
-                            st.write(f"Max Drawdown: **{bt_results['max_drawdown']:.2f}%**")
-                            st.write(f"Sharpe Ratio: **{bt_results['sharpe_ratio']:.2f}**")
-                            st.write(f"Stops Atingidos: **{bt_results['stops_hit']}** ({bt_results['stops_hit']/bt_results['total_trades']*100:.1f}%)")
-                            st.write(f"Alvos Atingidos: **{bt_results['targets_hit']}** ({bt_results['targets_hit']/bt_results['total_trades']*100:.1f}%)")
-                            st.write(f"Tempo Médio: **{bt_results['avg_bars_in_trade']:.0f} dias**")
-                        
-                        # Tabela de trades
-                        if len(bt_results['trades_list']) > 0:
-                            st.markdown("---")
-                            st.markdown("**📋 Histórico de Trades**")
-                            
-                            trades_df = pd.DataFrame(bt_results['trades_list'])
-                            trades_df['entry_date'] = pd.to_datetime(trades_df['entry_date']).dt.strftime('%d/%m/%Y')
-                            trades_df['exit_date'] = pd.to_datetime(trades_df['exit_date']).dt.strftime('%d/%m/%Y')
-                            
-                            st.dataframe(
-                                trades_df[['entry_date', 'entry_price', 'exit_date', 'exit_price', 'return_pct', 'exit_reason']].round(2),
-                                use_container_width=True,
-                                column_config={
-                                    "entry_date": "Entrada",
-                                    "entry_price": "Preço Entrada",
-                                    "exit_date": "Saída",
-                                    "exit_price": "Preço Saída",
-                                    "return_pct": st.column_config.NumberColumn("Retorno %", format="%.2f%%"),
-                                    "exit_reason": "Razão"
-                                }
-                            )
-                    
-                    # Interpretação
-                    st.markdown("---")
-                    st.markdown("**💡 Interpretação:**")
-                    
-                    if bt_results['win_rate'] >= 60:
-                        st.success(f"✅ **Estratégia FORTE** - Win rate de {bt_results['win_rate']:.1f}% é excelente!")
-                    elif bt_results['win_rate'] >= 50:
-                        st.info(f"ℹ️ **Estratégia BOA** - Win rate de {bt_results['win_rate']:.1f}% é positivo.")
-                    else:
-                        st.warning(f"⚠️ **Estratégia FRACA** - Win rate de {bt_results['win_rate']:.1f}% está abaixo de 50%.")
-                    
-                    if bt_results['profit_factor'] >= 2.0:
-                        st.success(f"✅ **Profit Factor {bt_results['profit_factor']:.2f}** - Ótimo! Cada R$ 1 perdido gera R$ {bt_results['profit_factor']:.2f} de ganho.")
-                    elif bt_results['profit_factor'] >= 1.5:
-                        st.info(f"ℹ️ **Profit Factor {bt_results['profit_factor']:.2f}** - Bom! Lucrativo mas pode melhorar.")
-                    else:
-                        st.warning(f"⚠️ **Profit Factor {bt_results['profit_factor']:.2f}** - Baixo. Revise parâmetros de stop/alvo.")
-                    
-                else:
-                    st.warning("⚠️ Nenhum trade identificado no período histórico. A estratégia não gerou sinais suficientes.")
-        else:
-            st.info("ℹ️ Nenhum sinal de compra encontrado nos ativos analisados.")
+                st.warning(", ".join(analysis.failed))
         
-        # Download
-        st.markdown("---")
-        st.subheader("💾 Exportar")
-        
-        csv = conv_results.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            "📥 Baixar CSV",
-            csv,
-            f"cacas_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            "text/csv",
-            use_container_width=True
-        )
+        show_results(analysis, atr_mult, target_mult)
     
     else:
         st.error(f"❌ Nenhum ativo processado ({fail}/{total} falharam)")
@@ -0,0 +1,122 @@
+"""
+Máquina de estados dos trades do backtest compilada com Numba
+
+Mesmas regras de CacasBacktester._identify_trades. Sem numba, roda como
+Python puro sobre os mesmos arrays.
+"""
+
+import numpy as np
+
+from indicators._njit import njit, NUMBA_AVAILABLE
+
+# Códigos de saída (int8) -> texto de exit_reason
+EXIT_STOP = 0
+EXIT_TARGET = 1
+EXIT_END = 2
+EXIT_REASONS = np.array(['Stop Loss', 'Target', 'End of Data'], dtype=object)
+
+
+@njit(cache=True, nogil=True)
+def _first_exit_scan(lows, highs, start, stop, target):
+    """Primeira barra >= start que bate o stop ou o alvo: (barra, EXIT_*) ou (n, EXIT_END)"""
+    n = lows.shape[0]
+    
+    for i in range(start, n):
+        if lows[i] <= stop:
+            return i, EXIT_STOP
+        if highs[i] >= target:
+            return i, EXIT_TARGET
+    
+    return n, EXIT_END
+
+
+def _first_exit_numpy(lows, highs, start, stop, target):
+    """Versão numpy de _first_exit_scan (fallback sem numba): argmax das máscaras"""
+    n = lows.shape[0]
+    
+    if start >= n:
+        return n, EXIT_END
+    
+    hit_stop = lows[start:] <= stop
+    hit_target = highs[start:] >= target
+    s = int(np.argmax(hit_stop)) if hit_stop.any() else n
+    t = int(np.argmax(hit_target)) if hit_target.any() else n
+    
+    # Stop e alvo na mesma barra: vale o stop (checado primeiro)
+    if s == n and t == n:
+        return n, EXIT_END
+    if s <= t:
+        return start + s, EXIT_STOP
+    return start + t, EXIT_TARGET
+
+
+# Com numba o laço compilado para na primeira barra; sem numba, comparações vetorizadas
+first_exit = _first_exit_scan if NUMBA_AVAILABLE else _first_exit_numpy
+
+
+@njit(cache=True, nogil=True)
+def trade_state_machine(closes, lows, highs, atrs, candidates, atr_mult, target_mult):
+    """
+    Percorre as barras diárias abrindo e fechando uma posição por vez
+    
+    Entrada no fechamento de uma barra candidata (sinal diário e semanal = 1);
+    saída no stop (mínima <= stop, checado primeiro) ou no alvo (máxima >= alvo)
+    nas barras seguintes; posição aberta no fim fecha no último fechamento.
+    Fora de posição o laço salta direto para a próxima candidata; em posição a
+    saída é localizada por first_exit.
+    
+    Args:
+        candidates (np.ndarray): Índices (crescentes) das barras com entrada possível
+    
+    Returns:
+        tuple: (entry_i, exit_i, exit_px, stop_px, target_px, reason) com um
+            elemento por trade (índices de barra e reason = EXIT_*)
+    """
+    n = closes.shape[0]
+    n_cand = candidates.shape[0]
+    entry_i = np.empty(n_cand, dtype=np.int64)
+    exit_i = np.empty(n_cand, dtype=np.int64)
+    exit_px = np.empty(n_cand)
+    stop_px = np.empty(n_cand)
+    target_px = np.empty(n_cand)
+    reason = np.empty(n_cand, dtype=np.int8)
+    
+    k = 0
+    c = 0
+    i = 0
+    
+    while True:
+        # Próxima candidata a partir da barra i (sem posição aberta)
+        while c < n_cand and candidates[c] < i:
+            c += 1
+        
+        if c == n_cand:
+            break
+        
+        entry = candidates[c]
+        stop_distance = atrs[entry] * atr_mult
+        stop = closes[entry] - stop_distance
+        target = closes[entry] + stop_distance * target_mult
+        
+        # Em posição: primeira barra seguinte que bate o stop ou o alvo
+        i, code = first_exit(lows, highs, entry + 1, stop, target)
+        
+        if code == EXIT_STOP:
+            price = stop
+        elif code == EXIT_TARGET:
+            price = target
+        else:
+            price = closes[n - 1]
+        
+        entry_i[k] = entry
+        exit_i[k] = min(i, n - 1)
+        exit_px[k] = price
+        stop_px[k] = stop
+        target_px[k] = target
+        reason[k] = code
+        k += 1
+        
+        # A barra de saída não abre posição - procura a partir da seguinte
+        i += 1
+    
+    return entry_i[:k], exit_i[:k], exit_px[:k], stop_px[:k], target_px[:k], reason[:k]
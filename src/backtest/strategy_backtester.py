@@ -5,7 +5,10 @@ Testa performance histórica da estratégia de convergência
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from ._trade_loops import trade_state_machine, EXIT_REASONS
 
 
 class CacasBacktester:
@@ -48,168 +51,127 @@ class CacasBacktester:
         
         return results
     
-    def _identify_trades(self, daily_df: pd.DataFrame, weekly_df: pd.DataFrame) -> List[Dict]:
+    def _identify_trades(self, daily_df: pd.DataFrame, weekly_df: pd.DataFrame) -> pd.DataFrame:
         """
         Identifica todos os trades baseado na estratégia de convergência
+        
+        Returns:
+            DataFrame com um trade por linha (entry_date, entry_price, exit_date,
+            exit_price, exit_reason, stop_loss, target, return_pct, bars_in_trade)
         """
-        trades = []
-        in_position = False
-        entry_idx = None
-        entry_price = None
-        stop_loss = None
-        target = None
+        # Alinhar dados semanais com diários: cada dia recebe o sinal da última
+        # semana com data <= dia (merge ordenado em uma passada, 0 antes da primeira)
+        weekly_sig = weekly_df[['sinal']].rename(columns={'sinal': 'weekly_signal'})
         
-        # Alinhar dados semanais com diários
-        daily_df = daily_df.copy()
-        daily_df['weekly_signal'] = 0
+        # merge_asof exige chaves do mesmo dtype (inclusive a unidade: s/ms/us/ns)
+        if weekly_sig.index.dtype != daily_df.index.dtype:
+            weekly_sig.index = weekly_sig.index.astype(daily_df.index.dtype)
         
-        for idx, row in daily_df.iterrows():
-            # Pegar sinal semanal correspondente
-            weekly_row = weekly_df[weekly_df.index <= row.name].iloc[-1] if len(weekly_df[weekly_df.index <= row.name]) > 0 else None
-            
-            if weekly_row is not None:
-                daily_df.at[idx, 'weekly_signal'] = weekly_row['sinal']
+        daily_df = pd.merge_asof(
+            daily_df, weekly_sig,
+            left_index=True, right_index=True, direction='backward'
+        )
+        daily_df['weekly_signal'] = daily_df['weekly_signal'].fillna(0)
         
-        # Identificar trades
-        for idx, row in daily_df.iterrows():
-            # ENTRADA: Convergência (ambos sinais = 1)
-            if not in_position:
-                daily_signal = row.get('sinal', 0)
-                weekly_signal = row.get('weekly_signal', 0)
-                
-                if daily_signal == 1 and weekly_signal == 1:
-                    # Abrir posição
-                    in_position = True
-                    entry_idx = idx
-                    entry_price = row['Close']
-                    
-                    # Calcular stop e alvo
-                    atr = row.get('ATR', row['Close'] * 0.02)  # Fallback: 2% do preço
-                    stop_distance = atr * self.atr_multiplier
-                    stop_loss = entry_price - stop_distance
-                    target = entry_price + (stop_distance * self.target_multiplier)
-            
-            # SAÍDA: Stop ou alvo atingido
-            elif in_position:
-                low = row['Low']
-                high = row['High']
-                close = row['Close']
-                
-                # Verificar stop loss (bateu mínima)
-                if low <= stop_loss:
-                    # Stop loss atingido
-                    exit_price = stop_loss
-                    exit_idx = idx
-                    exit_reason = 'Stop Loss'
-                    
-                    trades.append({
-                        'entry_date': entry_idx,
-                        'entry_price': entry_price,
-                        'exit_date': exit_idx,
-                        'exit_price': exit_price,
-                        'exit_reason': exit_reason,
-                        'stop_loss': stop_loss,
-                        'target': target,
-                        'return_pct': ((exit_price - entry_price) / entry_price) * 100,
-                        'bars_in_trade': (exit_idx - entry_idx).days if hasattr(exit_idx - entry_idx, 'days') else 1
-                    })
-                    
-                    in_position = False
-                
-                # Verificar alvo (bateu máxima)
-                elif high >= target:
-                    # Alvo atingido
-                    exit_price = target
-                    exit_idx = idx
-                    exit_reason = 'Target'
-                    
-                    trades.append({
-                        'entry_date': entry_idx,
-                        'entry_price': entry_price,
-                        'exit_date': exit_idx,
-                        'exit_price': exit_price,
-                        'exit_reason': exit_reason,
-                        'stop_loss': stop_loss,
-                        'target': target,
-                        'return_pct': ((exit_price - entry_price) / entry_price) * 100,
-                        'bars_in_trade': (exit_idx - entry_idx).days if hasattr(exit_idx - entry_idx, 'days') else 1
-                    })
-                    
-                    in_position = False
+        # Colunas como arrays float64/int64 (tipos fixos: uma compilação só)
+        closes = daily_df['Close'].to_numpy(dtype=np.float64)
+        lows = daily_df['Low'].to_numpy(dtype=np.float64)
+        highs = daily_df['High'].to_numpy(dtype=np.float64)
         
-        # Se ainda estiver em posição ao final, fechar no último preço
-        if in_position:
-            last_row = daily_df.iloc[-1]
-            exit_price = last_row['Close']
-            exit_idx = last_row.name
-            
-            trades.append({
-                'entry_date': entry_idx,
-                'entry_price': entry_price,
-                'exit_date': exit_idx,
-                'exit_price': exit_price,
-                'exit_reason': 'End of Data',
-                'stop_loss': stop_loss,
-                'target': target,
-                'return_pct': ((exit_price - entry_price) / entry_price) * 100,
-                'bars_in_trade': (exit_idx - entry_idx).days if hasattr(exit_idx - entry_idx, 'days') else 1
-            })
+        if 'ATR' in daily_df.columns:
+            atrs = daily_df['ATR'].to_numpy(dtype=np.float64)
+        else:
+            atrs = closes * 0.02  # Fallback: 2% do preço
+        
+        if 'sinal' in daily_df.columns:
+            sigs = daily_df['sinal'].to_numpy(dtype=np.int64)
+        else:
+            sigs = np.zeros(len(closes), dtype=np.int64)
+        
+        wsigs = daily_df['weekly_signal'].to_numpy(dtype=np.int64)
+        
+        # Barras de entrada possível (convergência de compra) - poucas; o laço salta entre elas
+        candidates = np.flatnonzero((sigs == 1) & (wsigs == 1))
+        
+        # Laço compilado (numba) - devolve uma linha por trade em arrays paralelos
+        entry_i, exit_i, exit_px, stop_px, target_px, reason = trade_state_machine(
+            closes, lows, highs, atrs, candidates,
+            self.atr_multiplier, self.target_multiplier
+        )
+        
+        # Tabela de trades montada uma vez a partir das colunas (sem um dict por trade)
+        dates = daily_df.index
+        entry_dates = dates[entry_i]
+        exit_dates = dates[exit_i]
+        entry_px = closes[entry_i]
+        held = exit_dates - entry_dates
+        
+        trades = pd.DataFrame({
+            'entry_date': entry_dates,
+            'entry_price': entry_px,
+            'exit_date': exit_dates,
+            'exit_price': exit_px,
+            'exit_reason': EXIT_REASONS[reason],
+            'stop_loss': stop_px,
+            'target': target_px,
+            'return_pct': (exit_px - entry_px) / entry_px * 100,
+            'bars_in_trade': held.days if isinstance(held, pd.TimedeltaIndex) else 1
+        })
         
         return trades
     
-    def _calculate_metrics(self, trades: List[Dict], daily_df: pd.DataFrame) -> Dict:
+    def _calculate_metrics(self, trades_df: pd.DataFrame, daily_df: pd.DataFrame) -> Dict:
         """
         Calcula métricas de performance do backtest
         """
-        if len(trades) == 0:
+        if len(trades_df) == 0:
             return self._empty_results()
         
-        trades_df = pd.DataFrame(trades)
-        
-        # Separar wins e losses
-        wins = trades_df[trades_df['return_pct'] > 0]
-        losses = trades_df[trades_df['return_pct'] <= 0]
+        # Uma passada sobre o array de retornos (sem fatiar o DataFrame)
+        r = trades_df['return_pct'].to_numpy(dtype=np.float64)
+        win = r > 0
         
         # Métricas básicas
-        total_trades = len(trades_df)
-        winning_trades = len(wins)
-        losing_trades = len(losses)
+        total_trades = len(r)
+        winning_trades = int(win.sum())
+        losing_trades = total_trades - winning_trades
         win_rate = (winning_trades / total_trades) * 100 if total_trades > 0 else 0
         
         # Retornos
-        total_return = trades_df['return_pct'].sum()
-        avg_return = trades_df['return_pct'].mean()
-        avg_win = wins['return_pct'].mean() if len(wins) > 0 else 0
-        avg_loss = losses['return_pct'].mean() if len(losses) > 0 else 0
+        total_return = r.sum()
+        avg_return = r.mean()
+        avg_win = r[win].mean() if winning_trades > 0 else 0
+        avg_loss = r[~win].mean() if losing_trades > 0 else 0
         
         # Profit Factor
-        gross_profit = wins['return_pct'].sum() if len(wins) > 0 else 0
-        gross_loss = abs(losses['return_pct'].sum()) if len(losses) > 0 else 0
+        gross_profit = r[win].sum()
+        gross_loss = abs(r[~win].sum())
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
         
         # Drawdown
-        cumulative_returns = (1 + trades_df['return_pct'] / 100).cumprod()
-        running_max = cumulative_returns.cummax()
+        cumulative_returns = np.cumprod(1 + r / 100)
+        running_max = np.maximum.accumulate(cumulative_returns)
         drawdown = (cumulative_returns - running_max) / running_max * 100
         max_drawdown = drawdown.min()
         
-        # Sharpe Ratio (assumindo 252 dias úteis)
-        returns_std = trades_df['return_pct'].std()
-        sharpe_ratio = (avg_return / returns_std) * np.sqrt(252 / trades_df['bars_in_trade'].mean()) if returns_std > 0 else 0
+        # Tempo médio em trade
+        avg_bars = trades_df['bars_in_trade'].to_numpy(dtype=np.float64).mean()
         
-        # Melhor e pior trade
-        best_trade = trades_df['return_pct'].max()
-        worst_trade = trades_df['return_pct'].min()
+        # Sharpe Ratio (assumindo 252 dias úteis; desvio amostral como no pandas)
+        returns_std = r.std(ddof=1) if total_trades > 1 else 0
+        sharpe_ratio = (avg_return / returns_std) * np.sqrt(252 / avg_bars) if returns_std > 0 else 0
         
-        # Tempo médio em trade
-        avg_bars = trades_df['bars_in_trade'].mean()
+        # Melhor e pior trade
+        best_trade = r.max()
+        worst_trade = r.min()
         
         # Expectativa matemática
         expectancy = (win_rate / 100) * avg_win + ((100 - win_rate) / 100) * avg_loss
         
         # Contagem por resultado
-        stops_hit = len(trades_df[trades_df['exit_reason'] == 'Stop Loss'])
-        targets_hit = len(trades_df[trades_df['exit_reason'] == 'Target'])
+        reasons = trades_df['exit_reason'].to_numpy()
+        stops_hit = int((reasons == 'Stop Loss').sum())
+        targets_hit = int((reasons == 'Target').sum())
         
         # Taxa de acerto ajustada (apenas stops e alvos)
         completed_trades = stops_hit + targets_hit
@@ -234,7 +196,7 @@ class CacasBacktester:
             'expectancy': expectancy,
             'targets_hit': targets_hit,
             'stops_hit': stops_hit,
-            'trades_list': trades,
+            'trades': trades_df,
             'start_date': daily_df.index[0],
             'end_date': daily_df.index[-1]
         }
@@ -260,7 +222,7 @@ class CacasBacktester:
             'expectancy': 0,
             'targets_hit': 0,
             'stops_hit': 0,
-            'trades_list': [],
+            'trades': pd.DataFrame(),
             'start_date': None,
             'end_date': None
         }
@@ -306,41 +268,53 @@ class CacasBacktester:
         return text
 
 
-def run_batch_backtest(results: Dict, atr_multiplier: float, target_multiplier: float) -> pd.DataFrame:
+def _run_one(backtester: CacasBacktester, ticker: str, data: Dict) -> Dict:
+    """Backtest de um ativo resumido em uma linha da tabela de run_batch_backtest"""
+    bt_result = backtester.run_backtest(data['daily'], data['weekly'])
+    
+    return {
+        'ticker': ticker,
+        'total_trades': bt_result['total_trades'],
+        'win_rate': bt_result['win_rate'],
+        'win_rate_ajustado': bt_result['adjusted_win_rate'],
+        'retorno_total': bt_result['total_return'],
+        'retorno_medio': bt_result['avg_return'],
+        'profit_factor': bt_result['profit_factor'],
+        'max_drawdown': bt_result['max_drawdown'],
+        'sharpe_ratio': bt_result['sharpe_ratio'],
+        'expectancia': bt_result['expectancy'],
+        'alvos_atingidos': bt_result['targets_hit'],
+        'stops_atingidos': bt_result['stops_hit']
+    }
+
+
+def run_batch_backtest(results: Dict, atr_multiplier: float, target_multiplier: float,
+                       max_workers: Optional[int] = None) -> pd.DataFrame:
     """
     Executa backtest em múltiplos ativos
     
+    Os ativos são independentes e rodam em threads: o laço dos trades é
+    compilado sem o GIL (nogil), então usa vários núcleos sem copiar os
+    DataFrames para outros processos.
+    
     Args:
         results: Dict com resultados da análise (contém daily e weekly data)
         atr_multiplier: Multiplicador do ATR para stop
         target_multiplier: Multiplicador do risco para alvo
+        max_workers: Threads simultâneas (padrão: do ThreadPoolExecutor)
         
     Returns:
         DataFrame com resultados de backtest para cada ativo
     """
     backtester = CacasBacktester(atr_multiplier, target_multiplier)
     
-    backtest_results = []
+    if not results:
+        return pd.DataFrame()
     
-    for ticker, data in results.items():
-        daily_df = data['daily']
-        weekly_df = data['weekly']
-        
-        bt_result = backtester.run_backtest(daily_df, weekly_df)
-        
-        backtest_results.append({
-            'ticker': ticker,
-            'total_trades': bt_result['total_trades'],
-            'win_rate': bt_result['win_rate'],
-            'win_rate_ajustado': bt_result['adjusted_win_rate'],
-            'retorno_total': bt_result['total_return'],
-            'retorno_medio': bt_result['avg_return'],
-            'profit_factor': bt_result['profit_factor'],
-            'max_drawdown': bt_result['max_drawdown'],
-            'sharpe_ratio': bt_result['sharpe_ratio'],
-            'expectancia': bt_result['expectancy'],
-            'alvos_atingidos': bt_result['targets_hit'],
-            'stops_atingidos': bt_result['stops_hit']
-        })
+    # map mantém a ordem dos ativos
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        backtest_results = list(executor.map(
+            lambda item: _run_one(backtester, *item), results.items()
+        ))
     
     return pd.DataFrame(backtest_results)
@@ -2,10 +2,77 @@
 Carregador de ativos multi-mercado (B3, US Stocks, US ETFs, US REITs, Crypto)
 """
 
+import re
+import importlib.util
+import numpy as np
 import pandas as pd
 import streamlit as st
+from functools import lru_cache
 from pathlib import Path
 
+# Caracteres com significado em regex (str.contains interpreta a busca como regex)
+REGEX_SPECIAL = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+# Parser multi-thread do pyarrow quando instalado (senão o parser C do pandas)
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'c'
+
+# Um único tipo categórico para todas as categorias: concatenar arquivos mantém o tipo
+CATEGORIA_DTYPE = pd.CategoricalDtype([
+    'Ação BR', 'FII', 'ETF BR', 'BDR', 'Ação US', 'ETF US', 'REIT US', 'Crypto'
+])
+
+
+def _dedup_first(df, col):
+    """
+    Mantém só a primeira linha de cada valor de `col` (como drop_duplicates)
+    
+    np.unique ordena os valores como strings de tamanho fixo, sem a tabela
+    hash de objetos do pandas.
+    
+    Args:
+        df (pd.DataFrame): DataFrame de entrada
+        col (str): Coluna chave
+    
+    Returns:
+        pd.DataFrame: Linhas sem duplicatas, na ordem original (índice reiniciado)
+    """
+    _, first_idx = np.unique(df[col].to_numpy(dtype=str), return_index=True)
+    return df.iloc[np.sort(first_idx)].reset_index(drop=True)
+
+
+@lru_cache(maxsize=None)
+def _read_asset_csv(path, categoria):
+    """
+    Lê um CSV de ativos uma vez por processo (dentro ou fora do Streamlit)
+    
+    Args:
+        path (str): Caminho do CSV
+        categoria (str): Valor da coluna 'categoria'
+    
+    Returns:
+        pd.DataFrame: Ativos do arquivo (compartilhado - não alterar)
+    """
+    df = pd.read_csv(path, engine=CSV_ENGINE)
+    df['categoria'] = pd.Categorical([categoria] * len(df), dtype=CATEGORIA_DTYPE)
+    return df
+
+
+@lru_cache(maxsize=None)
+def _count_asset_rows(path):
+    """
+    Número de ativos de um CSV lendo só a coluna 'ticker'
+    
+    Args:
+        path (str): Caminho do CSV
+    
+    Returns:
+        int: Quantidade de linhas (0 se o arquivo não existir)
+    """
+    try:
+        return len(pd.read_csv(path, engine=CSV_ENGINE, usecols=['ticker']))
+    except FileNotFoundError:
+        return 0
+
 
 class AssetLoader:
     """Carrega ativos de múltiplos mercados dos CSVs no repositório"""
@@ -13,97 +80,88 @@ class AssetLoader:
     def __init__(self):
         # Caminho para pasta data (funciona no Streamlit Cloud)
         self.data_dir = Path(__file__).parent.parent.parent / "data"
+        
+        # Resultados por combinação de categorias (a instância vive em cache_resource)
+        self._category_cache = {}
+        
+        # Contagem por categoria (os CSVs não mudam durante a execução)
+        self._counts = None
+        
+        # Índices de busca por conjunto de categorias: {tuple(categorias): (df, índice)}
+        self._search_indexes = {}
+        
+        # Todos os ativos consolidados (load_all)
+        self._all_assets = None
+        
+        # (DataFrame de todos os ativos, {ticker: posição}) para get_asset_info
+        self._ticker_index = None
     
     # ==================== B3 BRASIL ====================
     
-    @st.cache_data(ttl=3600)  # Cache por 1 hora
-    def load_b3_acoes(_self):
+    def load_b3_acoes(self):
         """Carrega ações brasileiras (B3)"""
         try:
-            df = pd.read_csv(_self.data_dir / "b3_acoes.csv")
-            df['categoria'] = 'Ação BR'
-            return df
+            return _read_asset_csv(str(self.data_dir / "b3_acoes.csv"), 'Ação BR')
         except FileNotFoundError:
             st.error("❌ Arquivo b3_acoes.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'setor', 'categoria'])
     
-    @st.cache_data(ttl=3600)
-    def load_b3_fiis(_self):
+    def load_b3_fiis(self):
         """Carrega FIIs brasileiros (B3)"""
         try:
-            df = pd.read_csv(_self.data_dir / "b3_fiis.csv")
-            df['categoria'] = 'FII'
-            return df
+            return _read_asset_csv(str(self.data_dir / "b3_fiis.csv"), 'FII')
         except FileNotFoundError:
             st.error("❌ Arquivo b3_fiis.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'tipo', 'categoria'])
     
-    @st.cache_data(ttl=3600)
-    def load_b3_etfs(_self):
+    def load_b3_etfs(self):
         """Carrega ETFs brasileiros (B3)"""
         try:
-            df = pd.read_csv(_self.data_dir / "b3_etfs.csv")
-            df['categoria'] = 'ETF BR'
-            return df
+            return _read_asset_csv(str(self.data_dir / "b3_etfs.csv"), 'ETF BR')
         except FileNotFoundError:
             st.error("❌ Arquivo b3_etfs.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'tipo', 'categoria'])
     
-    @st.cache_data(ttl=3600)
-    def load_b3_bdrs(_self):
+    def load_b3_bdrs(self):
         """Carrega BDRs brasileiros (B3)"""
         try:
-            df = pd.read_csv(_self.data_dir / "b3_bdrs.csv")
-            df['categoria'] = 'BDR'
-            return df
+            return _read_asset_csv(str(self.data_dir / "b3_bdrs.csv"), 'BDR')
         except FileNotFoundError:
             st.error("❌ Arquivo b3_bdrs.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'empresa_original', 'categoria'])
     
     # ==================== MERCADO AMERICANO ====================
     
-    @st.cache_data(ttl=3600)
-    def load_us_stocks(_self):
+    def load_us_stocks(self):
         """Carrega ações americanas (US Stock)"""
         try:
-            df = pd.read_csv(_self.data_dir / "us_stocks.csv")
-            df['categoria'] = 'Ação US'
-            return df
+            return _read_asset_csv(str(self.data_dir / "us_stocks.csv"), 'Ação US')
         except FileNotFoundError:
             st.warning("❌ Arquivo us_stocks.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'setor', 'categoria'])
     
-    @st.cache_data(ttl=3600)
-    def load_us_etfs(_self):
+    def load_us_etfs(self):
         """Carrega ETFs americanos (US ETF)"""
         try:
-            df = pd.read_csv(_self.data_dir / "us_etfs.csv")
-            df['categoria'] = 'ETF US'
-            return df
+            return _read_asset_csv(str(self.data_dir / "us_etfs.csv"), 'ETF US')
         except FileNotFoundError:
             st.warning("❌ Arquivo us_etfs.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'tipo', 'categoria'])
     
-    @st.cache_data(ttl=3600)
-    def load_us_reits(_self):
+    def load_us_reits(self):
         """Carrega REITs americanos (US REIT)"""
         try:
-            df = pd.read_csv(_self.data_dir / "us_reits.csv")
-            df['categoria'] = 'REIT US'
-            return df
+            return _read_asset_csv(str(self.data_dir / "us_reits.csv"), 'REIT US')
         except FileNotFoundError:
             st.warning("❌ Arquivo us_reits.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'tipo', 'categoria'])
     
     # ==================== CRIPTOMOEDAS ====================
     
-    @st.cache_data(ttl=3600)
-    def load_crypto(_self):
+    def load_crypto(self):
         """Carrega criptomoedas (Crypto)"""
         try:
-            df = pd.read_csv(_self.data_dir / "crypto.csv")
-            df['categoria'] = 'Crypto'
-            return df
+            return _read_asset_csv(str(self.data_dir / "crypto.csv"), 'Crypto')
         except FileNotFoundError:
             st.warning("❌ Arquivo crypto.csv não encontrado!")
             return pd.DataFrame(columns=['ticker', 'nome', 'tipo', 'categoria'])
@@ -115,8 +173,16 @@ class AssetLoader:
         Carrega TODOS os ativos de TODOS os mercados
         
         Returns:
-            pd.DataFrame: DataFrame consolidado com todos os ativos
+            pd.DataFrame: DataFrame consolidado com todos os ativos (compartilhado - não alterar)
         """
+        # Concat + remoção de duplicatas uma vez só (os CSVs não mudam durante a execução)
+        if self._all_assets is None:
+            self._all_assets = self._load_all()
+        
+        return self._all_assets
+    
+    def _load_all(self):
+        """Concatena os ativos de todos os mercados (sem cache)"""
         dfs = []
         
         # Brasil (B3)
@@ -139,8 +205,7 @@ class AssetLoader:
         
         if dfs:
             result = pd.concat(dfs, ignore_index=True)
-            result = result.drop_duplicates(subset=['ticker'])
-            return result
+            return _dedup_first(result, 'ticker')
         else:
             return pd.DataFrame(columns=['ticker', 'nome', 'categoria'])
     
@@ -155,8 +220,18 @@ class AssetLoader:
                 - Crypto: 'Crypto'
         
         Returns:
-            pd.DataFrame: DataFrame filtrado
+            pd.DataFrame: DataFrame filtrado (compartilhado - não alterar)
         """
+        # Memoriza por combinação: reruns do Streamlit viram uma consulta ao dict
+        key = tuple(categories)
+        
+        if key not in self._category_cache:
+            self._category_cache[key] = self._filter_by_category(categories)
+        
+        return self._category_cache[key]
+    
+    def _filter_by_category(self, categories):
+        """Concatena os ativos das categorias pedidas (sem cache)"""
         dfs = []
         
         # Mapeia categorias para funções de carregamento
@@ -179,8 +254,7 @@ class AssetLoader:
         
         if dfs:
             result = pd.concat(dfs, ignore_index=True)
-            result = result.drop_duplicates(subset=['ticker'])
-            return result
+            return _dedup_first(result, 'ticker')
         else:
             return pd.DataFrame(columns=['ticker', 'nome', 'categoria'])
     
@@ -211,18 +285,70 @@ class AssetLoader:
         Returns:
             dict: Dicionário com informações do ativo ou None se não encontrado
         """
-        all_assets = self.load_all()
-        asset = all_assets[all_assets['ticker'] == ticker]
+        # Dicionário ticker -> posição montado na primeira consulta (tickers já sem duplicatas)
+        if self._ticker_index is None:
+            all_assets = self.load_all()
+            self._ticker_index = (
+                all_assets,
+                {t: pos for pos, t in enumerate(all_assets['ticker'].to_numpy())}
+            )
         
-        if not asset.empty:
-            return asset.iloc[0].to_dict()
+        all_assets, index = self._ticker_index
+        pos = index.get(ticker)
+        
+        if pos is not None:
+            return all_assets.iloc[pos].to_dict()
         else:
             return None
     
+    @staticmethod
+    def _bigrams(text):
+        """Conjunto de bigramas (pares de caracteres) de um texto em minúsculas"""
+        text = text.lower()
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+    
+    def _get_search_index(self, categories=None):
+        """
+        Índice invertido bigrama -> posições dos ativos (montado uma vez por categorias)
+        
+        Args:
+            categories (list, optional): Categorias para filtrar
+        
+        Returns:
+            tuple: (DataFrame dos ativos, {bigrama: set(posições)}, lista de textos)
+        """
+        key = tuple(categories) if categories else None
+        
+        if key not in self._search_indexes:
+            if categories:
+                df = self.filter_by_category(categories)
+            else:
+                df = self.load_all()
+            
+            # Ticker e nome indexados separadamente (busca não atravessa os dois)
+            texts = [
+                (str(ticker).lower(), '' if pd.isna(nome) else str(nome).lower())
+                for ticker, nome in zip(df['ticker'], df['nome'])
+            ]
+            
+            index = {}
+            for pos, (ticker, nome) in enumerate(texts):
+                for gram in self._bigrams(ticker) | self._bigrams(nome):
+                    index.setdefault(gram, set()).add(pos)
+            
+            self._search_indexes[key] = (df, index, texts)
+        
+        return self._search_indexes[key]
+    
     def search_assets(self, query, categories=None):
         """
         Busca ativos por nome ou ticker
         
+        Usa o índice de bigramas para achar candidatos e confirma a substring
+        só neles. Consultas de 1 caractere varrem os textos já em minúsculas do
+        índice; consultas com caracteres especiais de regex seguem pelo caminho
+        antigo (str.contains).
+        
         Args:
             query (str): Texto de busca
             categories (list, optional): Categorias para filtrar
@@ -230,16 +356,32 @@ class AssetLoader:
         Returns:
             pd.DataFrame: Ativos que correspondem à busca
         """
-        if categories:
-            df = self.filter_by_category(categories)
-        else:
-            df = self.load_all()
+        df, index, texts = self._get_search_index(categories)
         
         query = query.upper()
-        mask = (df['ticker'].str.contains(query, case=False, na=False)) | \
-               (df['nome'].str.contains(query, case=False, na=False))
         
-        return df[mask]
+        if REGEX_SPECIAL.search(query):
+            mask = (df['ticker'].str.contains(query, case=False, na=False)) | \
+                   (df['nome'].str.contains(query, case=False, na=False))
+            
+            return df[mask]
+        
+        q = query.lower()
+        
+        if len(q) < 2:
+            # Sem bigrama: substring direta nos textos pré-convertidos (sem case folding por linha)
+            candidates = range(len(texts))
+        else:
+            # Interseção das listas de postagem (menor primeiro)
+            postings = sorted((index.get(gram, set()) for gram in self._bigrams(q)), key=len)
+            candidates = set.intersection(*postings)
+        
+        positions = sorted(
+            pos for pos in candidates
+            if q in texts[pos][0] or q in texts[pos][1]
+        )
+        
+        return df.iloc[positions]
     
     def count_assets(self):
         """
@@ -248,26 +390,36 @@ class AssetLoader:
         Returns:
             dict: Dicionário com contagem por categoria
         """
+        # Os CSVs não mudam durante a execução - conta uma vez só
+        if self._counts is not None:
+            return dict(self._counts)
+        
         counts = {}
         
+        # Só a coluna de tickers: categorias não selecionadas não são carregadas inteiras
+        def rows(filename):
+            return _count_asset_rows(str(self.data_dir / filename))
+        
         # Brasil
-        counts['Ação BR'] = len(self.load_b3_acoes())
-        counts['FII'] = len(self.load_b3_fiis())
-        counts['ETF BR'] = len(self.load_b3_etfs())
-        counts['BDR'] = len(self.load_b3_bdrs())
+        counts['Ação BR'] = rows("b3_acoes.csv")
+        counts['FII'] = rows("b3_fiis.csv")
+        counts['ETF BR'] = rows("b3_etfs.csv")
+        counts['BDR'] = rows("b3_bdrs.csv")
         
         # EUA
-        counts['Ação US'] = len(self.load_us_stocks())
-        counts['ETF US'] = len(self.load_us_etfs())
-        counts['REIT US'] = len(self.load_us_reits())
+        counts['Ação US'] = rows("us_stocks.csv")
+        counts['ETF US'] = rows("us_etfs.csv")
+        counts['REIT US'] = rows("us_reits.csv")
         
         # Crypto
-        counts['Crypto'] = len(self.load_crypto())
+        counts['Crypto'] = rows("crypto.csv")
         
         # Total
         counts['Total'] = sum(counts.values())
         
-        return counts
+        self._counts = counts
+        
+        return dict(counts)
     
     def get_market_groups(self):
         """
@@ -0,0 +1,134 @@
+"""
+Cache em disco (parquet) para dados OHLCV
+Sobrevive a reinícios do Streamlit - evita baixar o mesmo histórico a cada sessão
+"""
+
+import os
+import re
+import tempfile
+import time
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+
+# Diretório padrão (pode ser trocado pela variável de ambiente CACAS_CACHE_DIR)
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'cacas'
+
+# Parquet precisa do pyarrow; sem ele o cache em disco fica desligado
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# Leituras simultâneas em get_many (o pyarrow libera o GIL ao ler/decodificar)
+READ_WORKERS = 8
+
+
+class DiskCache:
+    """Cache de DataFrames OHLCV em arquivos parquet por (ticker, período, intervalo)"""
+    
+    def __init__(self, cache_dir=None, max_age_hours=12):
+        """
+        Inicializa o cache
+        
+        Args:
+            cache_dir (str | Path): Diretório dos arquivos (padrão ~/.cache/cacas)
+            max_age_hours (float): Idade máxima de um arquivo para ser reutilizado
+        """
+        self.cache_dir = Path(cache_dir or os.environ.get('CACAS_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        self.max_age = max_age_hours * 3600
+        self.enabled = PARQUET_AVAILABLE
+    
+    def _path(self, ticker, period, interval):
+        """Caminho do arquivo (caracteres especiais do ticker viram '_')"""
+        safe = re.sub(r'[^\w.\-]', '_', ticker)
+        return self.cache_dir / f"{safe}_{period}_{interval}.parquet"
+    
+    def get(self, ticker, period='1y', interval='1d'):
+        """
+        Lê um DataFrame do cache se ainda estiver fresco (de hoje e dentro de max_age)
+        
+        Args:
+            ticker (str): Ticker do ativo
+            period (str): Período
+            interval (str): Intervalo
+        
+        Returns:
+            pd.DataFrame: Dados em cache ou None (ausente, velho ou ilegível)
+        """
+        if not self.enabled:
+            return None
+        
+        path = self._path(ticker, period, interval)
+        
+        try:
+            mtime = path.stat().st_mtime
+            
+            # Velho demais ou gravado em outro dia (novo pregão) -> baixa de novo
+            if time.time() - mtime > self.max_age or date.fromtimestamp(mtime) != date.today():
+                return None
+            
+            return pd.read_parquet(path)
+        except Exception:
+            return None
+    
+    def get_many(self, tickers, period='1y', interval='1d'):
+        """
+        Lê vários tickers do cache em paralelo
+        
+        Args:
+            tickers (list): Lista de tickers
+            period (str): Período
+            interval (str): Intervalo
+        
+        Returns:
+            dict: {ticker: DataFrame} só com os que estavam frescos no cache
+        """
+        if not self.enabled or not tickers:
+            return {}
+        
+        workers = max(1, min(READ_WORKERS, len(tickers)))
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = executor.map(lambda t: self.get(t, period, interval), tickers)
+            
+            return {t: data for t, data in zip(tickers, frames) if data is not None}
+    
+    def set(self, ticker, data, period='1y', interval='1d'):
+        """
+        Grava um DataFrame no cache (falhas de escrita são ignoradas)
+        
+        Args:
+            ticker (str): Ticker do ativo
+            data (pd.DataFrame): Dados OHLCV
+            period (str): Período
+            interval (str): Intervalo
+        """
+        if not self.enabled or data is None or data.empty:
+            return
+        
+        path = self._path(ticker, period, interval)
+        tmp = None
+        
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Escreve em arquivo temporário e renomeia (leitores nunca veem arquivo pela metade);
+            # temporário único por escrita - threads/sessões podem gravar a mesma chave juntas
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=path.stem + '.', suffix='.tmp')
+            os.close(fd)
+            
+            data.to_parquet(tmp, compression='zstd')
+            os.replace(tmp, path)
+        except Exception:
+            if tmp is not None:
+                Path(tmp).unlink(missing_ok=True)
+    
+    def clear(self):
+        """Remove todos os arquivos do cache"""
+        if not self.cache_dir.exists():
+            return
+        
+        for path in self.cache_dir.glob('*.parquet'):
+            path.unlink(missing_ok=True)
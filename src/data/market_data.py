@@ -3,25 +3,62 @@ Download de dados de mercado usando yfinance
 Versão otimizada para download em lote
 """
 
-import yfinance as yf
+import numpy as np
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 import warnings
 import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .disk_cache import DiskCache
 
 # Suprime todos os warnings e logs do yfinance
 warnings.filterwarnings('ignore')
 logging.getLogger('yfinance').setLevel(logging.CRITICAL)
 
+# Limita requisições simultâneas ao Yahoo (evita rate limit com downloads em thread)
+MAX_CONCURRENT_REQUESTS = 8
+_request_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# Tickers por chamada de yf.download em download_batch
+BATCH_SIZE = 20
+
+# Colunas que history()/download() devolvem com actions=False e auto_adjust=False
+OHLCV_COLUMNS = frozenset(['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume'])
+
+# Duração de cada período do yfinance (get_period_dates)
+PERIOD_DELTAS = {
+    '1mo': timedelta(days=30),
+    '3mo': timedelta(days=90),
+    '6mo': timedelta(days=180),
+    '1y': timedelta(days=365),
+    '2y': timedelta(days=730),
+    '3y': timedelta(days=1095),
+    '4y': timedelta(days=1460),
+    '5y': timedelta(days=1825),
+    '10y': timedelta(days=3650),
+}
+DEFAULT_PERIOD_DELTA = PERIOD_DELTAS['1y']
+
+# Timeout (s) de cada requisição - ticker inexistente/lento falha rápido em vez de prender a thread
+REQUEST_TIMEOUT = 5
+
 
 class MarketDataLoader:
     """Classe para download de dados de mercado"""
     
-    def __init__(self):
-        pass
+    def __init__(self, disk_cache=None):
+        """
+        Args:
+            disk_cache (DiskCache): Cache parquet em disco (padrão ~/.cache/cacas)
+        """
+        self.disk_cache = disk_cache or DiskCache()
     
     @staticmethod
+    @lru_cache(maxsize=512)
     def format_ticker_b3(ticker):
         """
         Formata ticker para padrão Yahoo Finance B3
@@ -31,7 +68,7 @@ class MarketDataLoader:
             ticker (str): Ticker (ex: PETR4, AAPL, BTC-USD)
         
         Returns:
-            str: Ticker formatado para Yahoo Finance
+            str: Ticker formatado para Yahoo Finance (memorizado por ticker)
         """
         # Se já tem sufixo (.SA, -USD, etc), não adiciona nada
         if '.' in ticker or '-' in ticker:
@@ -45,8 +82,7 @@ class MarketDataLoader:
         # Tickers americanos puros (AAPL, MSFT, etc) - retorna sem modificar
         return ticker
     
-    @st.cache_data(ttl=1800, show_spinner=False)
-    def download_single_ticker(_self, ticker, period='1y', interval='1d'):
+    def download_single_ticker(self, ticker, period='1y', interval='1d'):
         """
         Baixa dados de UM ticker usando Ticker API (mais confiável)
         
@@ -56,44 +92,147 @@ class MarketDataLoader:
             interval (str): Intervalo
         
         Returns:
-            pd.DataFrame: DataFrame com OHLCV ou None
+            pd.DataFrame: DataFrame com OHLCV ou None (compartilhado - não alterar)
         """
-        try:
-            ticker_yf = _self.format_ticker_b3(ticker)
-            
-            # Usa Ticker().history() - método mais estável
-            stock = yf.Ticker(ticker_yf)
-            
-            # Download direto via history (sem show_errors)
-            data = stock.history(
-                period=period,
-                interval=interval,
-                auto_adjust=False,
-                actions=False
-            )
-            
-            if data is None or data.empty:
-                return None
-            
-            # Padroniza colunas
-            if not data.columns.empty:
-                data.columns = data.columns.str.title()
-            
-            # Remove timezone
-            if hasattr(data.index, 'tz') and data.index.tz is not None:
-                data.index = data.index.tz_localize(None)
-            
-            # Limpa dados
-            data = data.dropna(how='all')
+        return fetch_ticker_history(ticker, period, interval, self.disk_cache)
+    
+    @staticmethod
+    def clean_ohlcv(data):
+        """
+        Padroniza um DataFrame OHLCV vindo do yfinance
+        
+        Args:
+            data (pd.DataFrame): Dados brutos
+        
+        Returns:
+            pd.DataFrame: Dados limpos ou None se insuficientes
+        """
+        if data is None or data.empty:
+            return None
+        
+        # Padroniza colunas (o yfinance já devolve os nomes certos: só renomeia se precisar)
+        if not OHLCV_COLUMNS.issuperset(data.columns):
+            data.columns = data.columns.str.title()
+        
+        # Remove timezone
+        if hasattr(data.index, 'tz') and data.index.tz is not None:
+            data.index = data.index.tz_localize(None)
+        
+        # Limpa dados
+        data = data.dropna(how='all')
+        
+        # Valida mínimo de dados
+        if len(data) < 10:
+            return None
+        
+        return MarketDataLoader.downcast_ohlcv(data)
+    
+    @staticmethod
+    def downcast_ohlcv(data):
+        """
+        Converte as colunas numéricas de preço/volume para float32
+        
+        Metade da memória de float64 - precisão de sobra para preços e canais.
+        
+        Args:
+            data (pd.DataFrame): Dados OHLCV
+        
+        Returns:
+            pd.DataFrame: Mesmos dados com colunas float32
+        """
+        numeric = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+        
+        return data.astype({col: 'float32' for col in numeric if col in data.columns})
+    
+    def download_batch(self, tickers, period='1y', interval='1d', on_batch=None):
+        """
+        Baixa vários tickers em lotes de BATCH_SIZE (yf.download agrupado por ticker)
+        
+        Args:
+            tickers (list): Lista de tickers
+            period (str): Período
+            interval (str): Intervalo
+            on_batch (callable, optional): on_batch(baixados, total) após cada lote
+        
+        Returns:
+            dict: {ticker: DataFrame} apenas com os tickers que vieram com dados
+        """
+        if not tickers:
+            return {}
+        
+        # Cache em disco primeiro (leituras em paralelo): só baixa o que não está fresco
+        results = self.disk_cache.get_many(tickers, period, interval)
+        
+        missing = [t for t in tickers if t not in results]
+        
+        # Lotes pequenos: uma requisição longa por vez a menos no Yahoo (429) e progresso por lote
+        for start in range(0, len(missing), BATCH_SIZE):
+            # {ticker_yf: ticker original}
+            formatted = {self.format_ticker_b3(t): t for t in missing[start:start + BATCH_SIZE]}
+            results.update(self._download_group(formatted, period, interval))
             
-            # Valida mínimo de dados
-            if len(data) < 10:
-                return None
+            if on_batch is not None:
+                on_batch(min(start + BATCH_SIZE, len(missing)), len(missing))
+        
+        return results
+    
+    def _download_group(self, formatted, period, interval):
+        """
+        Uma chamada yf.download para um lote de tickers
+        
+        Args:
+            formatted (dict): {ticker_yf: ticker original}
+            period (str): Período
+            interval (str): Intervalo
+        
+        Returns:
+            dict: {ticker: DataFrame} dos que vieram com dados (gravados no cache em disco)
+        """
+        results = {}
+        
+        import yfinance as yf
+        
+        try:
+            with _request_semaphore:
+                raw = yf.download(
+                    list(formatted),
+                    period=period,
+                    interval=interval,
+                    group_by='ticker',
+                    auto_adjust=False,
+                    threads=True,
+                    progress=False,
+                    timeout=REQUEST_TIMEOUT
+                )
+        except Exception:
+            return results
+        
+        if raw is None or raw.empty:
+            return results
+        
+        # Tickers presentes no retorno (calculado uma vez, não por ticker)
+        multi = isinstance(raw.columns, pd.MultiIndex)
+        available = set(raw.columns.get_level_values(0)) if multi else set()
+        
+        for ticker_yf, ticker in formatted.items():
+            # Colunas (ticker, campo) - cada ticker vira um DataFrame novo (sem .copy():
+            # clean_ohlcv só troca rótulos e devolve cópias de dropna/astype)
+            if multi:
+                if ticker_yf not in available:
+                    continue
+                data = raw[ticker_yf]
+            elif len(formatted) == 1:
+                data = raw
+            else:
+                continue
             
-            return data
+            data = self.clean_ohlcv(data)
             
-        except Exception:
-            return None
+            if data is not None:
+                results[ticker] = data
+                self.disk_cache.set(ticker, data, period, interval)
+        
+        return results
     
     def download_data(self, ticker, period='1y', interval='1d'):
         """
@@ -109,6 +248,47 @@ class MarketDataLoader:
         """
         return self.download_single_ticker(ticker, period, interval)
     
+    def _download_each(self, tickers, period, interval, on_done=None):
+        """
+        Baixa tickers individualmente em threads (espera de rede não segura o GIL)
+        
+        Args:
+            tickers (list): Lista de tickers
+            period (str): Período
+            interval (str): Intervalo
+            on_done (callable, optional): on_done(concluídos, ticker), chamado na
+                thread de quem chamou (pode atualizar widgets do Streamlit)
+        
+        Returns:
+            dict: {ticker: DataFrame ou None}
+        """
+        results = {}
+        
+        if not tickers:
+            return results
+        
+        # _request_semaphore continua limitando as requisições simultâneas ao Yahoo
+        workers = min(MAX_CONCURRENT_REQUESTS, len(tickers))
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.download_single_ticker, ticker, period, interval): ticker
+                for ticker in tickers
+            }
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                ticker = futures[future]
+                
+                try:
+                    results[ticker] = future.result()
+                except Exception:
+                    results[ticker] = None
+                
+                if on_done is not None:
+                    on_done(done, ticker)
+        
+        return results
+    
     def download_multiple(self, tickers, period='1y', interval='1d', show_progress=True):
         """
         Baixa dados de múltiplos ativos de forma otimizada
@@ -122,52 +302,66 @@ class MarketDataLoader:
         Returns:
             dict: {ticker: DataFrame}
         """
-        results = {}
-        failed = []
-        
         if show_progress:
             progress_bar = st.progress(0)
             status_text = st.empty()
+            status_text.text(f"📊 Baixando {len(tickers)} ativos...")
         
-        total = len(tickers)
-        
-        # Processa um por um (mais estável que batch)
-        for i, ticker in enumerate(tickers):
+        def on_batch(done, total):
             if show_progress:
-                progress = (i + 1) / total
-                progress_bar.progress(progress)
-                status_text.text(f"📊 Baixando: {ticker} ({i+1}/{total})")
-            
-            try:
-                data = self.download_single_ticker(ticker, period, interval)
-                
-                if data is not None and not data.empty and len(data) >= 10:
-                    results[ticker] = data
-                else:
-                    failed.append(ticker)
-                    
-            except Exception:
-                failed.append(ticker)
+                progress_bar.progress(done / total)
+                status_text.text(f"📊 Baixando em lote ({done}/{total})")
+        
+        # Cache em disco + yf.download agrupado (uma requisição por lote)
+        found = self.download_batch(tickers, period, interval, on_batch)
+        
+        # Individual (em paralelo) só para quem não veio no lote
+        missing = [t for t in tickers if t not in found]
+        total = len(missing)
+        
+        # Agrupa as atualizações de progresso (~50 no total) - cada uma é uma mensagem ao navegador
+        step = max(1, total // 50)
+        
+        def on_done(done, ticker):
+            if show_progress and (done % step == 0 or done == total):
+                progress_bar.progress(done / total)
+                status_text.text(f"📊 Baixando: {ticker} ({done}/{total})")
+        
+        found.update(self._download_each(missing, period, interval, on_done))
         
         if show_progress:
             progress_bar.empty()
             status_text.empty()
         
+        # Ordem da lista de entrada; menos de 10 barras conta como falha
+        results = {}
+        
+        for ticker in tickers:
+            data = found.get(ticker)
+            
+            if data is not None and not data.empty and len(data) >= 10:
+                results[ticker] = data
+        
         return results
     
     def get_daily_data(self, ticker, period='1y'):
-        """Retorna dados diários"""
+        """Retorna dados diários (cache em disco, senão download)"""
         return self.download_single_ticker(ticker, period=period, interval='1d')
     
+    def get_daily_batch(self, tickers, period='1y'):
+        """Retorna dados diários de vários tickers em uma chamada: {ticker: DataFrame}"""
+        return self.download_batch(tickers, period=period, interval='1d')
+    
     def get_weekly_data(self, ticker, period='2y'):
         """Retorna dados semanais"""
         # Baixa diários e converte (mais confiável)
-        daily = self.get_daily_data(ticker, period)
-        
+        return self._weekly_from_daily(ticker, self.get_daily_data(ticker, period), period)
+    
+    def _weekly_from_daily(self, ticker, daily, period):
+        """Semanal a partir dos diários já baixados (fallback: download semanal direto)"""
         if daily is not None and not daily.empty:
             return self.resample_to_weekly(daily)
         
-        # Fallback: tenta direto semanal
         return self.download_single_ticker(ticker, period=period, interval='1wk')
     
     def get_multi_timeframe(self, ticker, period='2y'):
@@ -181,8 +375,9 @@ class MarketDataLoader:
         Returns:
             dict: {'daily': DataFrame, 'weekly': DataFrame}
         """
+        # Um download diário para os dois timeframes
         daily = self.get_daily_data(ticker, period)
-        weekly = self.get_weekly_data(ticker, period)
+        weekly = self._weekly_from_daily(ticker, daily, period)
         
         return {
             'daily': daily,
@@ -216,8 +411,21 @@ class MarketDataLoader:
             if 'Adj Close' in daily_df.columns:
                 agg_dict['Adj Close'] = 'last'
             
-            # Resample para sexta-feira
-            weekly = daily_df.resample('W-FRI').agg(agg_dict)
+            index = daily_df.index
+            
+            if isinstance(index, pd.DatetimeIndex) and index.is_monotonic_increasing:
+                # Semana sábado..sexta como inteiro (dia 0 = quinta 01/01/1970): groupby direto,
+                # sem o motor de frequências do resample
+                days = index.to_numpy().astype('datetime64[D]').astype(np.int64)
+                weekly = daily_df.groupby((days - 2) // 7).agg(agg_dict)
+                
+                # Rótulo = sexta-feira que fecha a semana (como 'W-FRI'), na mesma unidade
+                # do índice diário (s/ms/us/ns) - o merge_asof do backtest exige o mesmo dtype
+                fridays = (weekly.index.to_numpy() * 7 + 8).astype('datetime64[D]')
+                weekly.index = pd.DatetimeIndex(fridays.astype(index.dtype), name=index.name)
+            else:
+                # Resample para sexta-feira
+                weekly = daily_df.resample('W-FRI').agg(agg_dict)
             
             # Limpa
             weekly = weekly.dropna(how='all')
@@ -225,7 +433,8 @@ class MarketDataLoader:
             if weekly.empty:
                 return None
             
-            return weekly
+            # Mesmos tipos dos diários (float32), qualquer que seja o tipo que a agregação devolva
+            return MarketDataLoader.downcast_ohlcv(weekly)
             
         except Exception:
             return None
@@ -241,40 +450,25 @@ class MarketDataLoader:
         Returns:
             bool: True se válido
         """
-        if df is None or df.empty:
+        # Checagens baratas primeiro: quantidade e colunas (sem tocar nos valores)
+        if df is None or len(df) < 10:
             return False
         
         required = ['Open', 'High', 'Low', 'Close', 'Volume']
         
-        # Checa colunas
-        has_cols = all(col in df.columns for col in required)
-        
-        # Checa quantidade
-        has_data = len(df) >= 10
-        
-        # Checa valores
-        has_values = not df[required].isna().all().any()
+        if not set(required).issubset(df.columns):
+            return False
         
-        return has_cols and has_data and has_values
+        # Checa valores (nenhuma coluna inteiramente vazia) coluna a coluna, sem montar o
+        # sub-DataFrame; para na primeira coluna vazia
+        return all(df[col].notna().to_numpy().any() for col in required)
     
     @staticmethod
     def get_period_dates(period_str):
         """Converte período string para datas"""
         end_date = datetime.now()
         
-        period_map = {
-            '1mo': timedelta(days=30),
-            '3mo': timedelta(days=90),
-            '6mo': timedelta(days=180),
-            '1y': timedelta(days=365),
-            '2y': timedelta(days=730),
-            '3y': timedelta(days=1095),
-            '4y': timedelta(days=1460),
-            '5y': timedelta(days=1825),
-            '10y': timedelta(days=3650),
-        }
-        
-        delta = period_map.get(period_str, timedelta(days=365))
+        delta = PERIOD_DELTAS.get(period_str, DEFAULT_PERIOD_DELTA)
         start_date = end_date - delta
         
         return start_date, end_date
@@ -286,25 +480,86 @@ class MarketDataLoader:
     
     def filter_available_tickers(self, tickers, show_progress=True):
         """Filtra tickers com dados disponíveis"""
-        available = []
-        
         if show_progress:
             progress_bar = st.progress(0)
             status_text = st.empty()
+            status_text.text(f"🔍 Verificando {len(tickers)} ativos...")
         
-        total = len(tickers)
+        # Último mês de todos em uma requisição; individual só para quem não veio
+        found = self.download_batch(tickers, period='1mo', interval='1d')
         
-        for i, ticker in enumerate(tickers):
-            if show_progress:
-                progress = (i + 1) / total
-                progress_bar.progress(progress)
-                status_text.text(f"🔍 Verificando: {ticker} ({i+1}/{total})")
-            
-            if self.check_data_availability(ticker):
-                available.append(ticker)
+        missing = [t for t in tickers if t not in found]
+        total = len(missing)
+        step = max(1, total // 50)
+        
+        def on_done(done, ticker):
+            if show_progress and (done % step == 0 or done == total):
+                progress_bar.progress(done / total)
+                status_text.text(f"🔍 Verificando: {ticker} ({done}/{total})")
+        
+        found.update(self._download_each(missing, '1mo', '1d', on_done))
         
         if show_progress:
             progress_bar.empty()
             status_text.empty()
         
-        return available
+        return [t for t in tickers if self.validate_dataframe(found.get(t))]
+
+
+@st.cache_resource(ttl=1800, show_spinner=False)
+def fetch_ticker_history(ticker, period='1y', interval='1d', _disk_cache=None):
+    """
+    Download de um ticker com cache em memória (st.cache_resource) e em disco
+    
+    Função de módulo: a chave do cache é só (ticker, period, interval), sem a
+    instância do MarketDataLoader. O DataFrame devolvido é compartilhado entre
+    chamadas (sem cópia) - não alterar.
+    
+    Args:
+        ticker (str): Ticker do ativo
+        period (str): Período
+        interval (str): Intervalo
+        _disk_cache (DiskCache, optional): Cache parquet (fora da chave do cache)
+    
+    Returns:
+        pd.DataFrame: DataFrame com OHLCV ou None
+    """
+    # Cache em disco antes da rede: sobrevive a reinícios e vale entre workers
+    if _disk_cache is not None:
+        cached = _disk_cache.get(ticker, period, interval)
+        
+        if cached is not None:
+            return cached
+    
+    import yfinance as yf  # import tardio: ~0.5s que a tela inicial não precisa pagar
+    
+    try:
+        ticker_yf = MarketDataLoader.format_ticker_b3(ticker)
+        
+        # Usa Ticker().history() - método mais estável
+        stock = yf.Ticker(ticker_yf)
+        
+        # Download direto via history (sem show_errors). Passes internos fixados
+        # desligados: sem pré/pós-mercado, reparo de preços ou linhas só com NaN
+        with _request_semaphore:
+            data = stock.history(
+                period=period,
+                interval=interval,
+                auto_adjust=False,
+                actions=False,
+                prepost=False,
+                repair=False,
+                keepna=False,
+                raise_errors=False,
+                timeout=REQUEST_TIMEOUT
+            )
+        
+        data = MarketDataLoader.clean_ohlcv(data)
+        
+        if _disk_cache is not None:
+            _disk_cache.set(ticker, data, period, interval)
+        
+        return data
+        
+    except Exception:
+        return None
@@ -0,0 +1,301 @@
+"""
+Kernels do Cacas Channel compilados com Numba
+
+Reproduzem exatamente a semântica do pandas usada em CacasChannel.calculate
+(rolling(window).max/min com min_periods = janela e ewm(span, adjust=False)),
+inclusive o tratamento de NaN. Sem numba, CacasChannel usa o caminho pandas.
+
+Os kernels seriais soltam o GIL (nogil): os ativos calculados nas threads do
+download individual (run_analysis) usam núcleos diferentes de verdade, sem o
+pickle de DataFrames que um pool de processos exigiria.
+"""
+
+import threading
+
+import numpy as np
+
+from ._njit import njit, prange
+
+# O threading layer padrão do numba (workqueue) não aceita kernels paralelos
+# disparados ao mesmo tempo de threads diferentes (sessões do Streamlit)
+_parallel_lock = threading.Lock()
+
+
+@njit(cache=True, nogil=True)
+def rolling_max(values, window):
+    """Máxima móvel - NaN até completar a janela ou se houver NaN nela"""
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    
+    # Fila monotônica de índices (valores decrescentes): O(n) em vez de O(n * janela)
+    queue = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    last_nan = -1
+    
+    for i in range(n):
+        v = values[i]
+        if v != v:
+            last_nan = i
+        else:
+            while tail > head and values[queue[tail - 1]] <= v:
+                tail -= 1
+            queue[tail] = i
+            tail += 1
+        
+        while tail > head and queue[head] <= i - window:
+            head += 1
+        
+        if i >= window - 1 and last_nan <= i - window:
+            out[i] = values[queue[head]]
+    
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rolling_min(values, window):
+    """Mínima móvel - NaN até completar a janela ou se houver NaN nela"""
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    
+    # Fila monotônica de índices (valores crescentes)
+    queue = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    last_nan = -1
+    
+    for i in range(n):
+        v = values[i]
+        if v != v:
+            last_nan = i
+        else:
+            while tail > head and values[queue[tail - 1]] >= v:
+                tail -= 1
+            queue[tail] = i
+            tail += 1
+        
+        while tail > head and queue[head] <= i - window:
+            head += 1
+        
+        if i >= window - 1 and last_nan <= i - window:
+            out[i] = values[queue[head]]
+    
+    return out
+
+
+@njit(cache=True, nogil=True)
+def ema(values, span):
+    """EMA igual a pd.Series.ewm(span=span, adjust=False).mean()"""
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    
+    if n == 0:
+        return out
+    
+    # Mesmas contas do pandas (alpha via com, não 2 / (span + 1)) para bater bit a bit
+    com = (span - 1) / 2.0
+    alpha = 1.0 / (1.0 + com)
+    old_wt_factor = 1.0 - alpha
+    new_wt = alpha
+    
+    weighted = values[0]
+    old_wt = 1.0
+    if weighted == weighted:
+        out[0] = weighted
+    
+    for i in range(1, n):
+        cur = values[i]
+        is_observation = cur == cur
+        
+        if weighted == weighted:
+            # NaN no meio da série envelhece o peso antigo (ignore_na=False)
+            old_wt *= old_wt_factor
+            
+            # Peculiaridade do pandas: com == 1 (span=3) recalcula o peso novo
+            if com == 1:
+                new_wt = 1.0 - old_wt
+            
+            if is_observation:
+                if weighted != cur:
+                    weighted = old_wt * weighted + new_wt * cur
+                    weighted /= old_wt + new_wt
+                old_wt = 1.0
+            
+            out[i] = weighted
+        elif is_observation:
+            weighted = cur
+            out[i] = weighted
+    
+    return out
+
+
+@njit(cache=True, nogil=True)
+def channel_full(close, upper, under, span):
+    """
+    Linhas, sinal e cruzamentos do Cacas Channel em uma única passada
+    
+    Mesmos valores de rolling_max/rolling_min/ema + sinal + crossover_scan,
+    mas cada barra é resolvida de uma vez (sem arrays intermediários relidos).
+    
+    Returns:
+        tuple: (superior, inferior, media, linha_ema, sinal, crossover)
+    """
+    n = close.shape[0]
+    superior = np.full(n, np.nan)
+    inferior = np.full(n, np.nan)
+    media = np.full(n, np.nan)
+    linha_ema = np.full(n, np.nan)
+    sinal = np.zeros(n, dtype=np.int8)
+    crossover = np.zeros(n, dtype=np.int8)
+    
+    # Filas monotônicas das janelas (mesmas de rolling_max/rolling_min)
+    queue_max = np.empty(n, dtype=np.int64)
+    queue_min = np.empty(n, dtype=np.int64)
+    head_max = 0
+    tail_max = 0
+    head_min = 0
+    tail_min = 0
+    last_nan = -1
+    
+    # Estado da EMA (mesmas contas de `ema`)
+    com = (span - 1) / 2.0
+    alpha = 1.0 / (1.0 + com)
+    old_wt_factor = 1.0 - alpha
+    new_wt = alpha
+    weighted = np.nan
+    old_wt = 1.0
+    
+    for i in range(n):
+        v = close[i]
+        if v != v:
+            last_nan = i
+        else:
+            while tail_max > head_max and close[queue_max[tail_max - 1]] <= v:
+                tail_max -= 1
+            queue_max[tail_max] = i
+            tail_max += 1
+            
+            while tail_min > head_min and close[queue_min[tail_min - 1]] >= v:
+                tail_min -= 1
+            queue_min[tail_min] = i
+            tail_min += 1
+        
+        # Máxima da janela superior (NaN se incompleta ou com NaN)
+        while tail_max > head_max and queue_max[head_max] <= i - upper:
+            head_max += 1
+        if i >= upper - 1 and last_nan <= i - upper:
+            superior[i] = close[queue_max[head_max]]
+        
+        # Mínima da janela inferior
+        while tail_min > head_min and queue_min[head_min] <= i - under:
+            head_min += 1
+        if i >= under - 1 and last_nan <= i - under:
+            inferior[i] = close[queue_min[head_min]]
+        
+        cur = (superior[i] + inferior[i]) / 2
+        media[i] = cur
+        is_observation = cur == cur
+        
+        # Passo da EMA
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            
+            if com == 1:
+                new_wt = 1.0 - old_wt
+            
+            if is_observation:
+                if weighted != cur:
+                    weighted = old_wt * weighted + new_wt * cur
+                    weighted /= old_wt + new_wt
+                old_wt = 1.0
+            
+            linha_ema[i] = weighted
+        elif is_observation:
+            weighted = cur
+            linha_ema[i] = weighted
+        
+        # Sinal e cruzamento com a barra anterior
+        if cur > linha_ema[i]:
+            sinal[i] = 1
+        elif cur < linha_ema[i]:
+            sinal[i] = -1
+        
+        if i > 0:
+            if sinal[i] == 1 and sinal[i - 1] == -1:
+                crossover[i] = 1
+            elif sinal[i] == -1 and sinal[i - 1] == 1:
+                crossover[i] = -1
+    
+    return superior, inferior, media, linha_ema, sinal, crossover
+
+
+@njit(parallel=True, cache=True)
+def _channel_lines_kernel(close, upper, under, span):
+    """Canal completo de cada linha de `close` (ativos × barras), ativos em paralelo"""
+    n_assets, n = close.shape
+    superior = np.empty((n_assets, n))
+    inferior = np.empty((n_assets, n))
+    media = np.empty((n_assets, n))
+    linha_ema = np.empty((n_assets, n))
+    sinal = np.empty((n_assets, n), dtype=np.int8)
+    crossover = np.empty((n_assets, n), dtype=np.int8)
+    
+    for a in prange(n_assets):
+        sup, inf, med, ema_a, sig, cross = channel_full(close[a], upper, under, span)
+        superior[a] = sup
+        inferior[a] = inf
+        media[a] = med
+        linha_ema[a] = ema_a
+        sinal[a] = sig
+        crossover[a] = cross
+    
+    return superior, inferior, media, linha_ema, sinal, crossover
+
+
+def channel_lines(close, upper, under, span):
+    """
+    Cacas Channel completo de vários ativos de uma vez
+    
+    Args:
+        close (np.ndarray): Fechamentos float64 (ativos × barras, mesmo calendário)
+        upper (int): Janela da linha superior
+        under (int): Janela da linha inferior
+        span (int): Span da EMA da linha média
+    
+    Returns:
+        tuple: (superior, inferior, media, linha_ema, sinal, crossover) com o
+            mesmo formato de `close`
+    """
+    with _parallel_lock:
+        return _channel_lines_kernel(close, upper, under, span)
+
+
+@njit(cache=True, nogil=True)
+def crossover_scan(sinal):
+    """Varre o sinal uma vez: 1 em -1 -> 1, -1 em 1 -> -1, 0 no resto"""
+    n = sinal.shape[0]
+    out = np.zeros(n, dtype=np.int8)
+    
+    for i in range(1, n):
+        if sinal[i] == 1 and sinal[i - 1] == -1:
+            out[i] = 1
+        elif sinal[i] == -1 and sinal[i - 1] == 1:
+            out[i] = -1
+    
+    return out
+
+
+def crossover_numpy(sinal):
+    """
+    Versão numpy do scan de cruzamentos (fallback sem numba)
+    
+    Com sinais em {-1, 0, 1}, há cruzamento exatamente onde o produto com a
+    barra anterior é -1, e a direção é o sinal atual: uma máscara só. Aceita
+    também matrizes (barras × ativos), comparando ao longo do eixo 0.
+    """
+    out = np.zeros(sinal.shape, dtype=np.int8)
+    prev, curr = sinal[:-1], sinal[1:]
+    
+    out[1:] = np.where(curr * prev == -1, curr, 0)
+    
+    return out
@@ -0,0 +1,17 @@
+"""
+Numba opcional: `njit`/`prange` reais se instalado, senão um decorador que
+não faz nada e o `range` do Python
+"""
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+    
+    def njit(*args, **kwargs):
+        """Decorador identidade (aceita @njit e @njit(cache=True))"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
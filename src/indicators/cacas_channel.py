@@ -6,6 +6,15 @@ Baseado no Pine Script original do TradingView
 import pandas as pd
 import numpy as np
 
+from ._njit import NUMBA_AVAILABLE
+from ._cacas_loops import channel_full, channel_lines, crossover_scan, crossover_numpy
+
+# Tendência como categórico (códigos int8): 0 = Lateral, 1 = Alta, 2 = Baixa
+TENDENCIA_DTYPE = pd.CategoricalDtype(['Lateral', 'Alta', 'Baixa'])
+
+# Desvio diário -> volatilidade anualizada em % (252 pregões)
+VOL_ANNUALIZE = np.sqrt(252.0) * 100.0
+
 
 class CacasChannel:
     """
@@ -31,12 +40,13 @@ class CacasChannel:
         self.under = under
         self.ema = ema
     
-    def calculate(self, df):
+    def calculate(self, df, include_crossover=False):
         """
         Calcula o indicador Cacas Channel
         
         Args:
             df (pd.DataFrame): DataFrame com coluna 'Close'
+            include_crossover (bool): Já inclui a coluna 'crossover' (ver detect_crossover)
         
         Returns:
             pd.DataFrame: DataFrame original com colunas adicionais:
@@ -48,6 +58,23 @@ class CacasChannel:
         """
         df = df.copy()
         
+        # Com numba: um kernel fundido sobre o array (mesmos valores do pandas)
+        if NUMBA_AVAILABLE:
+            superior, inferior, media, linha_ema, sinal, crossover = channel_full(
+                df['Close'].to_numpy(dtype=np.float64), self.upper, self.under, self.ema
+            )
+            
+            df['linha_superior'] = superior
+            df['linha_inferior'] = inferior
+            df['linha_media'] = media
+            df['linha_ema'] = linha_ema
+            df['sinal'] = sinal
+            
+            if include_crossover:
+                df['crossover'] = crossover
+            
+            return df
+        
         # Linha Superior (ind01) - Highest
         df['linha_superior'] = df['Close'].rolling(window=self.upper).max()
         
@@ -63,13 +90,20 @@ class CacasChannel:
         # Sinal: Linha Média vs Linha EMA
         # 1: Linha Média > Linha EMA (compra)
         # -1: Linha Média < Linha EMA (venda)
-        # 0: Neutro
-        df['sinal'] = 0
-        df.loc[df['linha_media'] > df['linha_ema'], 'sinal'] = 1
-        df.loc[df['linha_media'] < df['linha_ema'], 'sinal'] = -1
+        # 0: Neutro (inclusive onde as linhas ainda são NaN)
+        sinal = self._sign(df['linha_media'].to_numpy() - df['linha_ema'].to_numpy())
+        df['sinal'] = sinal
+        
+        if include_crossover:
+            df['crossover'] = crossover_numpy(sinal)
         
         return df
     
+    @staticmethod
+    def _sign(diff):
+        """Sinal (-1, 0, 1) em int8 de uma diferença; NaN vira 0"""
+        return np.nan_to_num(np.sign(diff)).astype(np.int8)
+    
     def calculate_volatility(self, df, len_mensal=21, len_trimestral=63, len_anual=252):
         """
         Calcula volatilidade histórica
@@ -84,19 +118,24 @@ class CacasChannel:
             pd.DataFrame: DataFrame com colunas de volatilidade adicionadas
         """
         df = df.copy()
+        self._add_volatility(df, len_mensal, len_trimestral, len_anual)
         
-        # Retornos logarítmicos
-        df['log_ret'] = np.log(df['Close'] / df['Close'].shift(1))
+        return df
+    
+    @staticmethod
+    def _add_volatility(df, len_mensal=21, len_trimestral=63, len_anual=252):
+        """Adiciona as colunas de volatilidade no próprio DataFrame (sem cópia)"""
+        # Retornos logarítmicos direto no array (uma vez para as três janelas)
+        close = df['Close'].to_numpy()
+        log_ret = np.empty(len(close), dtype=np.result_type(close.dtype, np.float32))
+        log_ret[:1] = np.nan
+        log_ret[1:] = np.log(close[1:] / close[:-1])
+        log_ret = pd.Series(log_ret)
         
         # Volatilidade anualizada (%)
-        df['vol_mensal'] = df['log_ret'].rolling(window=len_mensal).std() * np.sqrt(252) * 100
-        df['vol_trimestral'] = df['log_ret'].rolling(window=len_trimestral).std() * np.sqrt(252) * 100
-        df['vol_anual'] = df['log_ret'].rolling(window=len_anual).std() * np.sqrt(252) * 100
-        
-        # Remove coluna temporária
-        df = df.drop('log_ret', axis=1)
-        
-        return df
+        for name, window in (('vol_mensal', len_mensal), ('vol_trimestral', len_trimestral),
+                             ('vol_anual', len_anual)):
+            df[name] = log_ret.rolling(window=window).std().to_numpy() * VOL_ANNUALIZE
     
     def calculate_trend(self, df, sma_curta=50, sma_longa=200):
         """
@@ -111,18 +150,30 @@ class CacasChannel:
             pd.DataFrame: DataFrame com colunas de tendência
         """
         df = df.copy()
+        self._add_trend(df, sma_curta, sma_longa)
         
+        return df
+    
+    @staticmethod
+    def _add_trend(df, sma_curta=50, sma_longa=200):
+        """Adiciona as colunas de tendência no próprio DataFrame (sem cópia)"""
         df['sma_curta'] = df['Close'].rolling(window=sma_curta).mean()
         df['sma_longa'] = df['Close'].rolling(window=sma_longa).mean()
         
-        # Identifica tendência
-        df['tendencia'] = 'Lateral'
-        df.loc[df['sma_curta'] > df['sma_longa'], 'tendencia'] = 'Alta'
-        df.loc[df['sma_curta'] < df['sma_longa'], 'tendencia'] = 'Baixa'
-        
-        return df
+        # Identifica tendência (categórico montado direto dos códigos, sem strings por linha)
+        codes = CacasChannel._trend_codes(df['sma_curta'].to_numpy(), df['sma_longa'].to_numpy())
+        df['tendencia'] = pd.Categorical.from_codes(codes, dtype=TENDENCIA_DTYPE)
+    
+    @staticmethod
+    def _trend_codes(curta, longa):
+        """Códigos de TENDENCIA_DTYPE: 1 se curta > longa, 2 se curta < longa, 0 no resto"""
+        codes = np.zeros(curta.shape, dtype=np.int8)
+        codes[curta > longa] = 1
+        codes[curta < longa] = 2
+        return codes
     
-    def calculate_full(self, df, include_volatility=True, include_trend=True):
+    def calculate_full(self, df, include_volatility=True, include_trend=True,
+                       include_crossover=False):
         """
         Calcula indicador completo com todas as features
         
@@ -130,23 +181,150 @@ class CacasChannel:
             df (pd.DataFrame): DataFrame com OHLCV
             include_volatility (bool): Incluir cálculo de volatilidade
             include_trend (bool): Incluir identificação de tendência
+            include_crossover (bool): Incluir 'crossover' (dispensa o detect_crossover)
         
         Returns:
             pd.DataFrame: DataFrame completo com todos os indicadores
         """
-        # Indicador base
-        df = self.calculate(df)
+        # Indicador base (única cópia do DataFrame; o resto é adicionado nela)
+        df = self.calculate(df, include_crossover)
         
         # Volatilidade (opcional)
         if include_volatility:
-            df = self.calculate_volatility(df)
+            self._add_volatility(df)
         
         # Tendência (opcional)
         if include_trend:
-            df = self.calculate_trend(df)
+            self._add_trend(df)
         
         return df
     
+    def calculate_batch(self, frames, include_volatility=True, include_trend=True,
+                        include_crossover=False):
+        """
+        Calcula o indicador completo para vários ativos de uma vez
+        
+        Ativos com o mesmo calendário (mesmo índice) são empilhados em um
+        DataFrame largo (datas × tickers), então rolling/ewm rodam uma única
+        vez por grupo em vez de uma vez por ativo.
+        
+        Args:
+            frames (dict): {ticker: DataFrame com OHLCV}
+            include_volatility (bool): Incluir cálculo de volatilidade
+            include_trend (bool): Incluir identificação de tendência
+            include_crossover (bool): Incluir 'crossover' (dispensa o detect_crossover)
+        
+        Returns:
+            dict: {ticker: DataFrame} - mesmo resultado de calculate_full por ativo
+        """
+        results = {}
+        
+        for tickers in self._group_by_index(frames):
+            index = frames[tickers[0]].index
+            close = pd.DataFrame(
+                {i: frames[t]['Close'].to_numpy() for i, t in enumerate(tickers)},
+                index=index
+            )
+            
+            columns = {}
+            
+            # Linhas do canal, sinal e cruzamentos
+            if NUMBA_AVAILABLE:
+                # Um kernel para o grupo todo, um ativo por thread (ativos × barras -> .T)
+                lines = channel_lines(
+                    np.ascontiguousarray(close.to_numpy(dtype=np.float64).T),
+                    self.upper, self.under, self.ema
+                )
+                names = ('linha_superior', 'linha_inferior', 'linha_media', 'linha_ema', 'sinal', 'crossover')
+                
+                for name, values in zip(names, lines):
+                    if name != 'crossover' or include_crossover:
+                        columns[name] = values.T
+            else:
+                superior = close.rolling(window=self.upper).max()
+                inferior = close.rolling(window=self.under).min()
+                media = (superior + inferior) / 2
+                ema = media.ewm(span=self.ema, adjust=False).mean()
+                
+                columns['linha_superior'] = superior.to_numpy()
+                columns['linha_inferior'] = inferior.to_numpy()
+                columns['linha_media'] = media.to_numpy()
+                columns['linha_ema'] = ema.to_numpy()
+                columns['sinal'] = self._sign(columns['linha_media'] - columns['linha_ema'])
+                
+                if include_crossover:
+                    columns['crossover'] = crossover_numpy(columns['sinal'])
+            
+            # Volatilidade
+            if include_volatility:
+                log_ret = np.log(close / close.shift(1))
+                for name, window in (('vol_mensal', 21), ('vol_trimestral', 63), ('vol_anual', 252)):
+                    columns[name] = log_ret.rolling(window=window).std().to_numpy() * VOL_ANNUALIZE
+            
+            # Tendência
+            if include_trend:
+                columns['sma_curta'] = close.rolling(window=50).mean().to_numpy()
+                columns['sma_longa'] = close.rolling(window=200).mean().to_numpy()
+                columns['tendencia'] = self._trend_codes(columns['sma_curta'], columns['sma_longa'])
+            
+            # Desempilha de volta por ativo
+            for i, ticker in enumerate(tickers):
+                df = frames[ticker].copy()
+                for name, values in columns.items():
+                    if name == 'tendencia':
+                        df[name] = pd.Categorical.from_codes(values[:, i], dtype=TENDENCIA_DTYPE)
+                    else:
+                        df[name] = values[:, i]
+                results[ticker] = df
+        
+        return results
+    
+    @staticmethod
+    def _group_by_index(frames):
+        """Agrupa tickers que compartilham exatamente o mesmo índice de datas"""
+        groups = {}
+        
+        for ticker, df in frames.items():
+            key = (len(df), df.index[0], df.index[-1]) if len(df) else (0,)
+            candidates = groups.setdefault(key, [])
+            
+            for group in candidates:
+                if frames[group[0]].index.equals(df.index):
+                    group.append(ticker)
+                    break
+            else:
+                candidates.append([ticker])
+        
+        return [group for candidates in groups.values() for group in candidates]
+    
+    def is_near_band(self, df, tolerance=0.05):
+        """
+        Pré-filtro barato: preço atual perto da linha superior ou inferior
+        
+        Usa só o final da série (as janelas das linhas), sem calcular o
+        indicador completo.
+        
+        Args:
+            df (pd.DataFrame): DataFrame com OHLCV
+            tolerance (float): Distância máxima relativa ao preço (0.05 = 5%)
+        
+        Returns:
+            bool: True se o preço está a menos de `tolerance` de alguma banda
+        """
+        if df is None or len(df) < max(self.upper, self.under):
+            return False
+        
+        close = df['Close'].to_numpy()
+        last = close[-1]
+        
+        superior = np.nanmax(close[-self.upper:])
+        inferior = np.nanmin(close[-self.under:])
+        
+        return bool(
+            abs(last - superior) / last < tolerance or
+            abs(last - inferior) / last < tolerance
+        )
+    
     def detect_crossover(self, df):
         """
         Detecta cruzamentos entre linha média e linha EMA
@@ -162,16 +340,9 @@ class CacasChannel:
         """
         df = df.copy()
         
-        # Detecta mudança de sinal
-        df['crossover'] = 0
-        
-        # Cruzamento bullish: linha média cruza acima da EMA
-        bullish = (df['sinal'] == 1) & (df['sinal'].shift(1) == -1)
-        df.loc[bullish, 'crossover'] = 1
-        
-        # Cruzamento bearish: linha média cruza abaixo da EMA
-        bearish = (df['sinal'] == -1) & (df['sinal'].shift(1) == 1)
-        df.loc[bearish, 'crossover'] = -1
+        # Scan compilado sobre o array do sinal (sem Series intermediárias)
+        sinal = df['sinal'].to_numpy(dtype=np.int64)
+        df['crossover'] = crossover_scan(sinal) if NUMBA_AVAILABLE else crossover_numpy(sinal)
         
         return df
     
@@ -225,16 +396,14 @@ def calculate_atr(df, period=14):
     Returns:
         pd.Series: Série com valores do ATR
     """
-    df = df.copy()
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
     
-    # True Range
-    df['h_l'] = df['High'] - df['Low']
-    df['h_pc'] = abs(df['High'] - df['Close'].shift(1))
-    df['l_pc'] = abs(df['Low'] - df['Close'].shift(1))
-    
-    df['tr'] = df[['h_l', 'h_pc', 'l_pc']].max(axis=1)
+    # True Range nos arrays (sem copiar o DataFrame); fmax ignora NaN como o max(axis=1)
+    tr = np.fmax(high - low, np.abs(high - prev_close))
+    np.fmax(tr, np.abs(low - prev_close), out=tr)
     
     # ATR
-    atr = df['tr'].rolling(window=period).mean()
-    
-    return atr
+    return pd.Series(tr, index=df.index).rolling(window=period).mean()
@@ -3,6 +3,70 @@ Detector de convergências entre múltiplos timeframes
 """
 
 import pandas as pd
+import numpy as np
+
+# Status em ordem de prioridade (categórico ordenado: ordenar = comparar códigos)
+STATUS_DTYPE = pd.CategoricalDtype([
+    '🔵 SETUP COMPRA',
+    '🟣 SETUP VENDA',
+    '🟢 COMPRA CONVERGENTE',
+    '🔴 VENDA CONVERGENTE',
+    '🟡 AGUARDANDO ALTA',
+    '🟠 CONTRA-TENDÊNCIA',
+    '🟡 AGUARDANDO',
+    '⚪ NEUTRO',
+    'SEM DADOS'
+], ordered=True)
+
+TIPO_DTYPE = pd.CategoricalDtype(['ALTA', 'BAIXA', 'NEUTRO', 'DIVERGENTE'])
+
+
+def _classify(daily, weekly, daily_cross):
+    """
+    Regras de convergência para uma combinação de sinais (monta CONVERGENCE_TABLE)
+    
+    Returns:
+        tuple: (is_convergent, convergence_type, status, description)
+    """
+    if daily == weekly:
+        if daily == 1:
+            # Setup ideal: semanal já está, diário acabou de cruzar
+            if daily_cross == 1:
+                return True, 'ALTA', '🔵 SETUP COMPRA', '⚡ Setup ideal de compra! Diário cruzou para cima'
+            return True, 'ALTA', '🟢 COMPRA CONVERGENTE', 'Ambos timeframes em tendência de alta'
+        
+        if daily == -1:
+            # Setup de venda: estava convergente alto, diário cruzou para baixo
+            if daily_cross == -1:
+                return True, 'BAIXA', '🟣 SETUP VENDA', '⚡ Sinal de saída! Diário cruzou para baixo'
+            return True, 'BAIXA', '🔴 VENDA CONVERGENTE', 'Ambos timeframes em tendência de baixa'
+        
+        return True, 'NEUTRO', '⚪ NEUTRO', 'Ambos timeframes neutros'
+    
+    # Divergência
+    if weekly == 1 and daily == -1:
+        return False, 'DIVERGENTE', '🟡 AGUARDANDO ALTA', 'Semanal em alta, aguardando confirmação diária'
+    if weekly == -1 and daily == 1:
+        return False, 'DIVERGENTE', '🟠 CONTRA-TENDÊNCIA', 'Diário em alta, mas semanal em baixa (atenção!)'
+    return False, 'DIVERGENTE', '🟡 AGUARDANDO', 'Timeframes em direções opostas'
+
+
+# (sinal diário, sinal semanal, cruzamento diário) -> resultado de _classify,
+# para todas as 27 combinações de valores em {-1, 0, 1}
+CONVERGENCE_TABLE = {
+    (daily, weekly, cross): _classify(daily, weekly, cross)
+    for daily in (-1, 0, 1)
+    for weekly in (-1, 0, 1)
+    for cross in (-1, 0, 1)
+}
+
+# A mesma tabela em arrays para o scan vetorizado, na ordem de CONVERGENCE_TABLE:
+# posição = (diário + 1) * 9 + (semanal + 1) * 3 + (cruzamento + 1)
+_table_columns = list(zip(*CONVERGENCE_TABLE.values()))
+TABLE_CONVERGENT = np.array(_table_columns[0], dtype=bool)
+TABLE_TIPO = np.array(_table_columns[1], dtype=object)
+TABLE_STATUS = np.array(_table_columns[2], dtype=object)
+TABLE_DESCRICAO = np.array(_table_columns[3], dtype=object)
 
 
 class ConvergenceDetector:
@@ -25,7 +89,7 @@ class ConvergenceDetector:
         if df is None or df.empty:
             return None
         
-        return int(df['sinal'].iloc[-1])
+        return int(df['sinal'].iat[-1])
     
     @staticmethod
     def get_latest_crossover(df):
@@ -41,7 +105,7 @@ class ConvergenceDetector:
         if df is None or df.empty or 'crossover' not in df.columns:
             return None
         
-        return int(df['crossover'].iloc[-1])
+        return int(df['crossover'].iat[-1])
     
     def analyze_convergence(self, daily_df, weekly_df):
         """
@@ -80,86 +144,114 @@ class ConvergenceDetector:
             convergence['description'] = 'Dados insuficientes para análise'
             return convergence
         
-        # Verifica convergência
-        if daily_signal == weekly_signal:
-            convergence['is_convergent'] = True
-            
-            if daily_signal == 1:
-                convergence['convergence_type'] = 'ALTA'
-                convergence['status'] = '🟢 COMPRA CONVERGENTE'
-                convergence['description'] = 'Ambos timeframes em tendência de alta'
-                
-                # Setup ideal: semanal já está, diário acabou de cruzar
-                if weekly_signal == 1 and daily_cross == 1:
-                    convergence['status'] = '🔵 SETUP COMPRA'
-                    convergence['description'] = '⚡ Setup ideal de compra! Diário cruzou para cima'
-            
-            elif daily_signal == -1:
-                convergence['convergence_type'] = 'BAIXA'
-                convergence['status'] = '🔴 VENDA CONVERGENTE'
-                convergence['description'] = 'Ambos timeframes em tendência de baixa'
-                
-                # Setup de venda: estava convergente alto, diário cruzou para baixo
-                if weekly_signal == -1 and daily_cross == -1:
-                    convergence['status'] = '🟣 SETUP VENDA'
-                    convergence['description'] = '⚡ Sinal de saída! Diário cruzou para baixo'
-            
-            else:  # Ambos neutros
-                convergence['convergence_type'] = 'NEUTRO'
-                convergence['status'] = '⚪ NEUTRO'
-                convergence['description'] = 'Ambos timeframes neutros'
-        
-        else:
-            # Divergência
-            convergence['is_convergent'] = False
-            convergence['convergence_type'] = 'DIVERGENTE'
-            
-            if weekly_signal == 1 and daily_signal == -1:
-                convergence['status'] = '🟡 AGUARDANDO ALTA'
-                convergence['description'] = 'Semanal em alta, aguardando confirmação diária'
-            elif weekly_signal == -1 and daily_signal == 1:
-                convergence['status'] = '🟠 CONTRA-TENDÊNCIA'
-                convergence['description'] = 'Diário em alta, mas semanal em baixa (atenção!)'
-            else:
-                convergence['status'] = '🟡 AGUARDANDO'
-                convergence['description'] = 'Timeframes em direções opostas'
+        # Classificação pré-calculada (sem cruzamento = 0)
+        (
+            convergence['is_convergent'],
+            convergence['convergence_type'],
+            convergence['status'],
+            convergence['description']
+        ) = CONVERGENCE_TABLE[(daily_signal, weekly_signal, daily_cross or 0)]
         
         return convergence
     
+    @staticmethod
+    def _last_values(frames, column):
+        """
+        Último valor de uma coluna em cada DataFrame, como vetor
+        
+        Args:
+            frames (list): Lista de DataFrames
+            column (str): Coluna a extrair
+        
+        Returns:
+            np.ndarray: Vetor float (NaN onde não há dados/coluna)
+        """
+        values = np.full(len(frames), np.nan)
+        
+        for i, df in enumerate(frames):
+            if df is not None and not df.empty and column in df.columns:
+                # Acesso escalar direto (sem montar a Series da coluna)
+                values[i] = df.iat[-1, df.columns.get_loc(column)]
+        
+        return values
+    
     def scan_multiple_assets(self, assets_data):
         """
         Escaneia múltiplos ativos em busca de convergências
         
+        Extrai só a última linha de cada ativo e classifica todos de uma vez
+        (mesma CONVERGENCE_TABLE de analyze_convergence, indexada pelos sinais).
+        
         Args:
             assets_data (dict): {ticker: {'daily': df, 'weekly': df}}
         
         Returns:
             pd.DataFrame: DataFrame com resultados da análise
         """
-        results = []
+        tickers = []
+        daily_frames = []
+        weekly_frames = []
         
         for ticker, data in assets_data.items():
             daily_df = data.get('daily')
             weekly_df = data.get('weekly')
             
-            if daily_df is None or weekly_df is None:
+            # Semanal None = pulado pelo pré-filtro diário (ainda entra como aguardando)
+            if daily_df is None or (weekly_df is None and 'skip_reason' not in data):
                 continue
             
-            analysis = self.analyze_convergence(daily_df, weekly_df)
-            
-            result = {
-                'ticker': ticker,
-                'semanal': analysis['weekly_signal'],
-                'diario': analysis['daily_signal'],
-                'convergente': analysis['is_convergent'],
-                'tipo': analysis['convergence_type'],
-                'status': analysis['status'],
-                'descricao': analysis['description']
-            }
-            
-            results.append(result)
+            tickers.append(ticker)
+            daily_frames.append(daily_df)
+            weekly_frames.append(weekly_df)
         
-        df_results = pd.DataFrame(results)
+        if not tickers:
+            return pd.DataFrame()
+        
+        # Vetores (N_ativos,) com o estado atual de cada timeframe
+        d = self._last_values(daily_frames, 'sinal')
+        w = self._last_values(weekly_frames, 'sinal')
+        dc = self._last_values(daily_frames, 'crossover')
+        
+        skipped = np.array([df is None for df in weekly_frames])
+        missing = np.isnan(d) | (np.isnan(w) & ~skipped)
+        valid = ~missing & ~skipped
+        
+        # Posição de cada ativo em CONVERGENCE_TABLE (mesmas regras de analyze_convergence);
+        # sem cruzamento = 0, e NaN vira 0 só para indexar - inválidos são sobrescritos abaixo
+        codes = (
+            (np.nan_to_num(d) + 1) * 9
+            + (np.nan_to_num(w) + 1) * 3
+            + (np.nan_to_num(dc) + 1)
+        ).astype(np.intp)
+        
+        conv = TABLE_CONVERGENT[codes] & valid
+        tipo = np.where(valid, TABLE_TIPO[codes], 'DIVERGENTE')
+        status = TABLE_STATUS[codes]
+        descricao = TABLE_DESCRICAO[codes]
+        
+        # Semanal pulado pelo pré-filtro; sem dados tem prioridade
+        status[skipped] = '🟡 AGUARDANDO'
+        descricao[skipped] = 'Preço longe das bandas no diário (semanal não calculado)'
+        status[missing] = 'SEM DADOS'
+        descricao[missing] = 'Dados insuficientes para análise'
+        
+        # Sinais como int (None onde não há dados, igual a get_latest_signal)
+        if np.isnan(d).any() or np.isnan(w).any():
+            semanal = [None if np.isnan(v) else int(v) for v in w]
+            diario = [None if np.isnan(v) else int(v) for v in d]
+        else:
+            semanal = w.astype(np.int8)
+            diario = d.astype(np.int8)
+        
+        df_results = pd.DataFrame({
+            'ticker': tickers,
+            'semanal': semanal,
+            'diario': diario,
+            'convergente': conv,
+            'tipo': pd.Categorical(tipo, dtype=TIPO_DTYPE),
+            'status': pd.Categorical(status, dtype=STATUS_DTYPE),
+            'descricao': descricao
+        })
         
         return df_results
     
@@ -230,19 +322,16 @@ class ConvergenceDetector:
         Returns:
             pd.DataFrame: DataFrame ordenado
         """
-        priority_order = {
-            '🔵 SETUP COMPRA': 1,
-            '🟣 SETUP VENDA': 2,
-            '🟢 COMPRA CONVERGENTE': 3,
-            '🔴 VENDA CONVERGENTE': 4,
-            '🟡 AGUARDANDO ALTA': 5,
-            '🟠 CONTRA-TENDÊNCIA': 6,
-            '🟡 AGUARDANDO': 7,
-            '⚪ NEUTRO': 8,
-            'SEM DADOS': 9
-        }
+        # Status como categórico ordenado por prioridade: ordena pelos códigos
+        # (sem map nem coluna auxiliar no DataFrame recebido)
+        status = df['status']
+        
+        if status.dtype != STATUS_DTYPE:
+            status = status.astype(STATUS_DTYPE)
         
-        df['_priority'] = df['status'].map(priority_order)
-        df_sorted = df.sort_values('_priority').drop('_priority', axis=1)
+        # Código -1 (status desconhecido) vai para o fim, como NaN no sort_values
+        codes = status.cat.codes.to_numpy()
+        codes = np.where(codes < 0, len(STATUS_DTYPE.categories), codes)
+        order = np.argsort(codes, kind='stable')
         
-        return df_sorted
+        return df.iloc[order]
@@ -30,20 +30,24 @@ class RiskManager:
         Returns:
             pd.Series: Série com valores do ATR
         """
-        df = df.copy()
-        
-        # True Range components
-        df['h_l'] = df['High'] - df['Low']
-        df['h_pc'] = abs(df['High'] - df['Close'].shift(1))
-        df['l_pc'] = abs(df['Low'] - df['Close'].shift(1))
-        
-        # True Range = max dos 3 componentes
-        df['tr'] = df[['h_l', 'h_pc', 'l_pc']].max(axis=1)
+        high = df['High'].to_numpy(dtype=np.float64)
+        low = df['Low'].to_numpy(dtype=np.float64)
+        close = df['Close'].to_numpy(dtype=np.float64)
+        prev_close = np.concatenate(([np.nan], close[:-1]))
+        
+        # True Range = max dos 3 componentes, direto nos arrays (sem colunas temporárias
+        # nem max por linha); fmax ignora NaN como o max(axis=1) do pandas.
+        # Três buffers no total: abs e fmax escrevem sobre eles (out=)
+        tr = high - low
+        gap_high = np.subtract(high, prev_close)
+        gap_low = np.subtract(low, prev_close)
+        np.abs(gap_high, out=gap_high)
+        np.abs(gap_low, out=gap_low)
+        np.fmax(tr, gap_high, out=tr)
+        np.fmax(tr, gap_low, out=tr)
         
         # ATR = média móvel do True Range
-        atr = df['tr'].rolling(window=period).mean()
-        
-        return atr
+        return pd.Series(tr, index=df.index).rolling(window=period).mean()
     
     def calculate_stop_loss(self, df, entry_type='long'):
         """
@@ -59,12 +63,11 @@ class RiskManager:
         if df is None or df.empty:
             return None
         
-        # Calcula ATR
-        atr = self.calculate_atr(df)
-        latest_atr = atr.iloc[-1]
-        latest_close = df['Close'].iloc[-1]
-        latest_low = df['Low'].iloc[-1]
-        latest_high = df['High'].iloc[-1]
+        # ATR atual: só as últimas barras (a série inteira não é usada aqui)
+        latest_atr = self.latest_atr(df)
+        latest_close = df['Close'].iat[-1]
+        latest_low = df['Low'].iat[-1]
+        latest_high = df['High'].iat[-1]
         
         # Stop loss
         if entry_type == 'long':
@@ -104,18 +107,22 @@ class RiskManager:
         entry = stop_info['entry_price']
         risk = stop_info['risk']
         
-        targets = {}
+        # Todos os alvos de uma vez; as chaves usam os multiplicadores como recebidos
+        gains = risk * np.asarray(target_multipliers, dtype=float)
+        prices = entry + gains
+        gain_pcts = gains / entry * 100
         
-        for multiplier in target_multipliers:
-            target_price = entry + (risk * multiplier)
-            targets[f'target_{multiplier}x'] = {
-                'price': target_price,
+        return {
+            f'target_{multiplier}x': {
+                'price': price,
                 'multiplier': multiplier,
-                'gain': target_price - entry,
-                'gain_percent': ((target_price - entry) / entry) * 100
+                'gain': gain,
+                'gain_percent': gain_pct
             }
-        
-        return targets
+            for multiplier, price, gain, gain_pct in zip(
+                target_multipliers, prices.tolist(), gains.tolist(), gain_pcts.tolist()
+            )
+        }
     
     def calculate_position_size(self, capital, risk_percent, stop_info):
         """
@@ -212,6 +219,78 @@ class RiskManager:
         
         return plan
     
+    @staticmethod
+    def latest_atr(df, period=14):
+        """
+        Último valor do ATR (o mesmo de calculate_atr(df).iloc[-1])
+        
+        Usa só as últimas period + 1 barras, sem montar a série inteira.
+        
+        Args:
+            df (pd.DataFrame): DataFrame com High, Low, Close
+            period (int): Período para cálculo
+        
+        Returns:
+            float: ATR atual (NaN se não houver barras suficientes)
+        """
+        tail = df.iloc[-(period + 1):]
+        high = tail['High'].to_numpy(dtype=np.float64)
+        low = tail['Low'].to_numpy(dtype=np.float64)
+        close = tail['Close'].to_numpy(dtype=np.float64)
+        prev_close = np.concatenate(([np.nan], close[:-1]))
+        
+        # fmax ignora NaN como o max(axis=1) do pandas
+        tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))[-period:]
+        
+        if len(tr) < period:
+            return np.nan
+        
+        return tr.mean()
+    
+    def generate_trade_plan_batch(self, frames, entry_type='long', target_multiplier=2.0):
+        """
+        Gera stop e alvo principal de vários ativos de uma vez
+        
+        Só a última barra (e o ATR) de cada ativo é extraída; as contas de
+        stop/alvo são vetorizadas entre ativos (mesmas de generate_trade_plan).
+        
+        Args:
+            frames (dict): {ticker: DataFrame com OHLC}
+            entry_type (str): 'long' ou 'short'
+            target_multiplier (float): Multiplicador de risco para alvo
+        
+        Returns:
+            pd.DataFrame: Uma linha por ticker (índice) com entry, atr, stop_loss,
+                risk, risk_percent, target, gain_percent e risk_reward
+        """
+        tickers = [t for t, df in frames.items() if df is not None and not df.empty]
+        
+        entry = np.array([frames[t]['Close'].iat[-1] for t in tickers], dtype=np.float64)
+        low = np.array([frames[t]['Low'].iat[-1] for t in tickers], dtype=np.float64)
+        high = np.array([frames[t]['High'].iat[-1] for t in tickers], dtype=np.float64)
+        atr = np.array([self.latest_atr(frames[t]) for t in tickers], dtype=np.float64)
+        
+        stop_distance = atr * self.atr_multiplier
+        
+        if entry_type == 'long':
+            stop_loss = low - stop_distance
+        else:
+            stop_loss = high + stop_distance
+        
+        risk = np.abs(entry - stop_loss)
+        target = entry + risk * target_multiplier
+        
+        return pd.DataFrame({
+            'entry': entry,
+            'atr': atr,
+            'stop_loss': stop_loss,
+            'risk': risk,
+            'risk_percent': risk / entry * 100,
+            'target': target,
+            'gain_percent': (target - entry) / entry * 100,
+            'risk_reward': target_multiplier
+        }, index=pd.Index(tickers, name='ticker'))
+    
     @staticmethod
     def format_trade_plan(plan):
         """
@@ -1,10 +1,12 @@
 """
 Módulo de geração de gráficos para Cacas Channel
 Gráficos interativos com Plotly
+
+O Plotly é importado dentro dos métodos que montam figuras: importar este
+módulo não carrega o Plotly.
 """
 
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
 import pandas as pd
 
 
@@ -24,6 +26,30 @@ class CacasChannelChart:
             'grid': '#262730'
         }
     
+    def _layout(self, xaxis=None, yaxis=None, **layout):
+        """
+        Layout das figuras com o tema (plotly_dark + fundo e grade) em um lugar só
+        
+        Fundo e grade vão explícitos no layout, não num template próprio: o tema
+        padrão do st.plotly_chart substitui o template da figura.
+        
+        Args:
+            xaxis (dict): Configuração do eixo X (a grade do tema é acrescentada)
+            yaxis (dict): Configuração do eixo Y (a grade do tema é acrescentada)
+            **layout: Demais chaves do layout da figura
+        
+        Returns:
+            dict: Layout para o go.Figure
+        """
+        return dict(
+            template='plotly_dark',
+            xaxis=dict(xaxis or {}, gridcolor=self.colors['grid']),
+            yaxis=dict(yaxis or {}, gridcolor=self.colors['grid']),
+            plot_bgcolor=self.colors['bg'],
+            paper_bgcolor=self.colors['bg'],
+            **layout
+        )
+    
     def create_single_chart(self, df, title="Cacas Channel", 
                            show_stop=False, stop_price=None,
                            show_target=False, target_price=None,
@@ -43,88 +69,73 @@ class CacasChannelChart:
         Returns:
             go.Figure: Figura Plotly
         """
-        fig = go.Figure()
-        
-        # Candlesticks
-        fig.add_trace(go.Candlestick(
-            x=df.index,
-            open=df['Open'],
-            high=df['High'],
-            low=df['Low'],
-            close=df['Close'],
-            name='Preço',
-            increasing_line_color=self.colors['green'],
-            decreasing_line_color=self.colors['red']
-        ))
-        
-        # Linha Superior (Vermelha)
-        fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df['linha_superior'],
-            mode='lines',
-            name='Superior',
-            line=dict(color=self.colors['red'], width=1),
-            opacity=0.7
-        ))
-        
-        # Linha Inferior (Verde)
-        fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df['linha_inferior'],
-            mode='lines',
-            name='Inferior',
-            line=dict(color=self.colors['green'], width=1),
-            opacity=0.7
-        ))
+        import plotly.graph_objects as go
         
-        # Linha Média (Branca) - PRINCIPAL
-        fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df['linha_media'],
-            mode='lines',
-            name='Linha Branca (Média)',
-            line=dict(color=self.colors['white'], width=2),
-        ))
-        
-        # Linha EMA (Laranja) - PRINCIPAL
-        fig.add_trace(go.Scatter(
-            x=df.index,
-            y=df['linha_ema'],
-            mode='lines',
-            name='Linha Laranja (EMA)',
-            line=dict(color=self.colors['orange'], width=2),
-        ))
-        
-        # Stop Loss (se fornecido)
-        if show_stop and stop_price is not None:
-            fig.add_hline(
-                y=stop_price,
-                line_dash="dash",
-                line_color=self.colors['red'],
-                line_width=2,
-                annotation_text=f"Stop: R$ {stop_price:.2f}",
-                annotation_position="right"
-            )
-        
-        # Alvo (se fornecido)
-        if show_target and target_price is not None:
-            fig.add_hline(
-                y=target_price,
-                line_dash="dash",
-                line_color=self.colors['green'],
-                line_width=2,
-                annotation_text=f"Alvo: R$ {target_price:.2f}",
-                annotation_position="right"
+        # Traces e layout montados antes e passados de uma vez ao go.Figure
+        # (uma validação só, em vez de add_trace/update_layout repetidos)
+        traces = [
+            # Candlesticks
+            go.Candlestick(
+                x=df.index,
+                open=df['Open'],
+                high=df['High'],
+                low=df['Low'],
+                close=df['Close'],
+                name='Preço',
+                increasing_line_color=self.colors['green'],
+                decreasing_line_color=self.colors['red']
+            ),
+            # Linha Superior (Vermelha)
+            go.Scatter(
+                x=df.index,
+                y=df['linha_superior'],
+                mode='lines',
+                name='Superior',
+                line=dict(color=self.colors['red'], width=1),
+                opacity=0.7
+            ),
+            # Linha Inferior (Verde)
+            go.Scatter(
+                x=df.index,
+                y=df['linha_inferior'],
+                mode='lines',
+                name='Inferior',
+                line=dict(color=self.colors['green'], width=1),
+                opacity=0.7
+            ),
+            # Linha Média (Branca) - PRINCIPAL
+            go.Scatter(
+                x=df.index,
+                y=df['linha_media'],
+                mode='lines',
+                name='Linha Branca (Média)',
+                line=dict(color=self.colors['white'], width=2),
+            ),
+            # Linha EMA (Laranja) - PRINCIPAL
+            go.Scatter(
+                x=df.index,
+                y=df['linha_ema'],
+                mode='lines',
+                name='Linha Laranja (EMA)',
+                line=dict(color=self.colors['orange'], width=2),
             )
+        ]
         
         # Sinais de cruzamento (se existir coluna crossover)
         if 'crossover' in df.columns:
+            # Posições dos cruzamentos direto nos arrays (sem copiar o DataFrame):
+            # uma varredura da coluna e a separação só entre os cruzamentos
+            cross = df['crossover'].to_numpy()
+            cross_pos = np.flatnonzero(cross)
+            up = cross[cross_pos] > 0
+            bull_pos = cross_pos[up]
+            bear_pos = cross_pos[~up]
+            
             # Cruzamentos de alta (bullish)
-            bullish = df[df['crossover'] == 1]
-            if len(bullish) > 0:
-                fig.add_trace(go.Scatter(
-                    x=bullish.index,
-                    y=bullish['Low'] * 0.98,  # Abaixo da mínima
+            if len(bull_pos) > 0:
+                traces.append(go.Scatter(
+                    x=df.index[bull_pos],
+                    y=df['Low'].to_numpy()[bull_pos] * 0.98,  # Abaixo da mínima
                     mode='markers',
                     name='Compra',
                     marker=dict(
@@ -135,11 +146,10 @@ class CacasChannelChart:
                 ))
             
             # Cruzamentos de baixa (bearish)
-            bearish = df[df['crossover'] == -1]
-            if len(bearish) > 0:
-                fig.add_trace(go.Scatter(
-                    x=bearish.index,
-                    y=bearish['High'] * 1.02,  # Acima da máxima
+            if len(bear_pos) > 0:
+                traces.append(go.Scatter(
+                    x=df.index[bear_pos],
+                    y=df['High'].to_numpy()[bear_pos] * 1.02,  # Acima da máxima
                     mode='markers',
                     name='Venda',
                     marker=dict(
@@ -150,16 +160,13 @@ class CacasChannelChart:
                 ))
         
         # Layout
-        fig.update_layout(
+        layout = self._layout(
             title=dict(
                 text=title,
                 font=dict(size=18, color=self.colors['white']),
                 x=0.5,
                 xanchor='center'
             ),
-            xaxis_title="Data",
-            yaxis_title="Preço (R$)",
-            template='plotly_dark',
             height=height,
             hovermode='x unified',
             showlegend=True,
@@ -171,16 +178,36 @@ class CacasChannelChart:
                 x=1
             ),
             xaxis=dict(
-                rangeslider=dict(visible=False),
-                gridcolor=self.colors['grid']
-            ),
-            yaxis=dict(
-                gridcolor=self.colors['grid']
+                title="Data",
+                rangeslider=dict(visible=False)
             ),
-            plot_bgcolor=self.colors['bg'],
-            paper_bgcolor=self.colors['bg']
+            yaxis=dict(title="Preço (R$)")
         )
         
+        fig = go.Figure(data=traces, layout=layout)
+        
+        # Stop Loss (se fornecido)
+        if show_stop and stop_price is not None:
+            fig.add_hline(
+                y=stop_price,
+                line_dash="dash",
+                line_color=self.colors['red'],
+                line_width=2,
+                annotation_text=f"Stop: R$ {stop_price:.2f}",
+                annotation_position="right"
+            )
+        
+        # Alvo (se fornecido)
+        if show_target and target_price is not None:
+            fig.add_hline(
+                y=target_price,
+                line_dash="dash",
+                line_color=self.colors['green'],
+                line_width=2,
+                annotation_text=f"Alvo: R$ {target_price:.2f}",
+                annotation_position="right"
+            )
+        
         return fig
     
     def create_dual_chart(self, daily_df, weekly_df, ticker,
@@ -234,30 +261,26 @@ class CacasChannelChart:
         Returns:
             go.Figure: Figura Plotly
         """
-        colors = ['green' if row['Close'] >= row['Open'] else 'red' 
-                  for _, row in df.iterrows()]
-        
-        fig = go.Figure()
+        import plotly.graph_objects as go
         
-        fig.add_trace(go.Bar(
-            x=df.index,
-            y=df['Volume'],
-            name='Volume',
-            marker_color=colors,
-            opacity=0.7
-        ))
+        # Cor por barra direto dos arrays (sem montar uma Series por linha)
+        colors = np.where(df['Close'].to_numpy() >= df['Open'].to_numpy(), 'green', 'red')
         
-        fig.update_layout(
-            title=title,
-            xaxis_title="Data",
-            yaxis_title="Volume",
-            template='plotly_dark',
-            height=200,
-            showlegend=False,
-            xaxis=dict(gridcolor=self.colors['grid']),
-            yaxis=dict(gridcolor=self.colors['grid']),
-            plot_bgcolor=self.colors['bg'],
-            paper_bgcolor=self.colors['bg']
+        fig = go.Figure(
+            data=[go.Bar(
+                x=df.index,
+                y=df['Volume'],
+                name='Volume',
+                marker_color=colors,
+                opacity=0.7
+            )],
+            layout=self._layout(
+                title=title,
+                height=200,
+                showlegend=False,
+                xaxis=dict(title="Data"),
+                yaxis=dict(title="Volume")
+            )
         )
         
         return fig
@@ -273,14 +296,16 @@ class CacasChannelChart:
         Returns:
             go.Figure: Figura Plotly
         """
-        fig = go.Figure()
+        import plotly.graph_objects as go
+        
+        traces = []
         
         for ticker, df in results_dict.items():
             if metric in df.columns:
                 # Normaliza para base 100
                 normalized = (df[metric] / df[metric].iloc[0]) * 100
                 
-                fig.add_trace(go.Scatter(
+                traces.append(go.Scatter(
                     x=df.index,
                     y=normalized,
                     mode='lines',
@@ -288,18 +313,16 @@ class CacasChannelChart:
                     line=dict(width=2)
                 ))
         
-        fig.update_layout(
-            title="Comparação de Performance (Base 100)",
-            xaxis_title="Data",
-            yaxis_title="Performance (%)",
-            template='plotly_dark',
-            height=500,
-            hovermode='x unified',
-            showlegend=True,
-            xaxis=dict(gridcolor=self.colors['grid']),
-            yaxis=dict(gridcolor=self.colors['grid']),
-            plot_bgcolor=self.colors['bg'],
-            paper_bgcolor=self.colors['bg']
+        fig = go.Figure(
+            data=traces,
+            layout=self._layout(
+                title="Comparação de Performance (Base 100)",
+                height=500,
+                hovermode='x unified',
+                showlegend=True,
+                xaxis=dict(title="Data"),
+                yaxis=dict(title="Performance (%)")
+            )
         )
         
         return fig
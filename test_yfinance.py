@@ -3,7 +3,9 @@ Script de teste para diagnosticar problemas com yfinance
 """
 
 import yfinance as yf
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 warnings.filterwarnings('ignore')
 
 print("=" * 60)
@@ -21,58 +23,76 @@ test_tickers = [
 
 print("\n📊 Testando download com diferentes métodos...\n")
 
-for ticker in test_tickers:
-    print(f"\n{'=' * 60}")
-    print(f"🎯 Testando: {ticker}")
-    print('=' * 60)
+# yf.download guarda os resultados em estado global do yfinance - um por vez
+download_lock = threading.Lock()
+
+
+def probe(ticker):
+    """Roda os 3 métodos para um ticker e devolve a saída como texto (sem misturar prints)"""
+    lines = []
+    log = lines.append
+    
+    log(f"\n{'=' * 60}")
+    log(f"🎯 Testando: {ticker}")
+    log('=' * 60)
+    
+    # Um único Ticker por ativo, usado nos métodos 1 e 3
+    stock = yf.Ticker(ticker)
     
     # MÉTODO 1: Ticker().history()
-    print("\n[Método 1] Ticker().history()")
+    log("\n[Método 1] Ticker().history()")
     try:
-        stock = yf.Ticker(ticker)
         data1 = stock.history(period="1mo", interval="1d")
         
         if data1 is not None and not data1.empty:
-            print(f"✅ SUCESSO! {len(data1)} dias baixados")
-            print(f"   Último preço: R$ {data1['Close'].iloc[-1]:.2f}")
-            print(f"   Colunas: {list(data1.columns)}")
+            log(f"✅ SUCESSO! {len(data1)} dias baixados")
+            log(f"   Último preço: R$ {data1['Close'].iat[-1]:.2f}")
+            log(f"   Colunas: {list(data1.columns)}")
         else:
-            print("❌ FALHOU - DataFrame vazio")
+            log("❌ FALHOU - DataFrame vazio")
     except Exception as e:
-        print(f"❌ ERRO: {str(e)[:100]}")
+        log(f"❌ ERRO: {str(e)[:100]}")
     
     # MÉTODO 2: download()
-    print("\n[Método 2] yf.download()")
+    log("\n[Método 2] yf.download()")
     try:
-        data2 = yf.download(
-            ticker,
-            period="1mo",
-            progress=False,
-            auto_adjust=False
-        )
+        with download_lock:
+            data2 = yf.download(
+                ticker,
+                period="1mo",
+                progress=False,
+                auto_adjust=False
+            )
         
         if data2 is not None and not data2.empty:
-            print(f"✅ SUCESSO! {len(data2)} dias baixados")
-            print(f"   Último preço: R$ {data2['Close'].iloc[-1]:.2f}")
+            log(f"✅ SUCESSO! {len(data2)} dias baixados")
+            log(f"   Último preço: R$ {data2['Close'].iloc[-1]:.2f}")
         else:
-            print("❌ FALHOU - DataFrame vazio")
+            log("❌ FALHOU - DataFrame vazio")
     except Exception as e:
-        print(f"❌ ERRO: {str(e)[:100]}")
+        log(f"❌ ERRO: {str(e)[:100]}")
     
     # MÉTODO 3: Info do ticker
-    print("\n[Método 3] Informações do ticker")
+    log("\n[Método 3] Informações do ticker")
     try:
-        stock = yf.Ticker(ticker)
         info = stock.info
         
         if info and 'longName' in info:
-            print(f"✅ Ticker válido!")
-            print(f"   Nome: {info.get('longName', 'N/A')}")
-            print(f"   Setor: {info.get('sector', 'N/A')}")
+            log(f"✅ Ticker válido!")
+            log(f"   Nome: {info.get('longName', 'N/A')}")
+            log(f"   Setor: {info.get('sector', 'N/A')}")
         else:
-            print("⚠️ Ticker pode estar inválido")
+            log("⚠️ Ticker pode estar inválido")
     except Exception as e:
-        print(f"❌ ERRO: {str(e)[:100]}")
+        log(f"❌ ERRO: {str(e)[:100]}")
+    
+    return "\n".join(lines)
+
+
+# Tickers em paralelo (a espera é de rede); a saída sai na ordem da lista
+with ThreadPoolExecutor(max_workers=len(test_tickers)) as executor:
+    for output in executor.map(probe, test_tickers):
+        print(output)
 
 print("\n" + "=" * 60)
 print("📋 RESUMO")
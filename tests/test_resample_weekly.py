@@ -0,0 +1,51 @@
+"""
+Testes do resample semanal (MarketDataLoader.resample_to_weekly)
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('streamlit')
+
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from data.market_data import MarketDataLoader
+
+
+def make_daily(unit):
+    """Seis semanas de pregões (seg..sex) com índice na unidade pedida"""
+    index = pd.bdate_range('2024-01-01', periods=30).as_unit(unit)
+    close = pd.Series(range(1, 31), index=index, dtype='float64')
+    
+    return pd.DataFrame({
+        'Open': close,
+        'High': close + 1,
+        'Low': close - 1,
+        'Close': close,
+        'Volume': 1000.0
+    })
+
+
+@pytest.mark.parametrize('unit', ['s', 'ms', 'us', 'ns'])
+def test_weekly_index_keeps_daily_unit(unit):
+    daily = make_daily(unit)
+    weekly = MarketDataLoader.resample_to_weekly(daily)
+    
+    assert weekly.index.dtype == daily.index.dtype
+    
+    # Mesmos rótulos (sextas) e valores do resample 'W-FRI'
+    expected = daily.resample('W-FRI').agg({'Close': 'last', 'Volume': 'sum'})
+    assert list(weekly.index) == list(expected.index)
+    assert weekly['Close'].tolist() == expected['Close'].tolist()
+    
+    # O merge_asof do backtest (diário x semanal) funciona com o mesmo dtype
+    merged = pd.merge_asof(
+        daily[['Close']],
+        weekly[['Close']].rename(columns={'Close': 'weekly_close'}),
+        left_index=True,
+        right_index=True
+    )
+    assert len(merged) == len(daily)